@@ -0,0 +1,84 @@
+#! usr/bin/env python
+"""
+Decode cost of JSON against XML responses, per page, for the endpoints that
+can be requested in either format: network updates, comment feeds and
+people searches.  Pages are generated by the stand-in server's fixtures
+(liclient.standin) and decoded as LinkedInAPI does -- lxml and
+LinkedInXMLParser for XML, json and LinkedInJSONParser for JSON -- so only
+parsing and mapping are timed, not the transfer.
+
+    python bench/formats.py --page-size 50 --repeat 50
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lxml import etree
+
+from liclient import standin
+from liclient.parsers.lijson import LinkedInJSONParser
+from liclient.parsers.lixml import LinkedInXMLParser
+
+STAMP = 1300000000000
+INTERVAL = 3600 * 1000
+
+
+def network_page(count):
+    stamps = [STAMP + i * INTERVAL for i in xrange(count)]
+    xml = '<network><updates total="%d">%s</updates></network>' % (
+        count, ''.join(standin.update_xml(s, standin.update_type(s, INTERVAL)) for s in stamps))
+    data = {'_total': count, 'values': [standin.update_json(s, standin.update_type(s, INTERVAL)) for s in stamps]}
+    return xml, json.dumps(data)
+
+
+def comment_page(count):
+    xml = '<update-comments total="%d">%s</update-comments>' % (
+        count, ''.join(standin.comment_xml('STAT-1', i) for i in xrange(count)))
+    data = {'_total': count, 'values': [standin.comment_json('STAT-1', i) for i in xrange(count)]}
+    return xml, json.dumps(data)
+
+
+def search_page(count):
+    ids = ['srch%d' % i for i in xrange(count)]
+    xml = '<people-search><people total="%d">%s</people><num-results>%d</num-results></people-search>' % (
+        count, ''.join(standin.person_xml(i) for i in ids), count)
+    data = {'people': {'_total': count, 'values': [standin.person_json(i) for i in ids]}, 'numResults': count}
+    return xml, json.dumps(data)
+
+
+PAGES = [
+    ('network', network_page),
+    ('update-comments', comment_page),
+    ('people-search', search_page),
+]
+
+
+def timed(fn, repeat):
+    start = time.time()
+    for _ in xrange(repeat):
+        fn()
+    return (time.time() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--page-size', type=int, default=50, help='records per page')
+    parser.add_argument('--repeat', type=int, default=50, help='pages decoded per format')
+    parser.add_argument('--compact', action='store_true', help='decode to the slots-based record types')
+    args = parser.parse_args()
+
+    print '%-16s %10s %10s %10s %10s %8s' % ('page', 'xml bytes', 'json bytes', 'xml ms', 'json ms', 'speedup')
+    for root, page in PAGES:
+        xml, content = page(args.page_size)
+        xml_ms = timed(lambda: LinkedInXMLParser(etree.fromstring(xml), compact=args.compact), args.repeat)
+        json_ms = timed(lambda: LinkedInJSONParser(json.loads(content), root, compact=args.compact), args.repeat)
+        print '%-16s %10d %10d %10.2f %10.2f %7.1fx' % (root, len(xml), len(content), xml_ms, json_ms,
+                                                        xml_ms / json_ms)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#! usr/bin/env python
+"""
+Per-object memory of decoded profiles and network updates, for the mapper
+classes and the slots-based records (liclient.parsers.records), with and
+without their XML kept.  Each variant decodes "--count" objects in a fresh
+interpreter and reports, per object still held, how much the resident set
+grew -- which includes the lxml trees kept alive through "xml", and heap
+fragmentation left by the trees that were freed -- and the exact size of
+the Python objects reachable from it, lxml elements left out.  Linux only
+(reads /proc/self/statm).
+
+    python bench/memory.py --count 5000
+"""
+import argparse
+import ctypes
+import gc
+import os
+import resource
+import subprocess
+import sys
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lxml import etree
+
+from liclient import standin
+from liclient.parsers.lixml import LinkedInXMLParser
+
+VARIANTS = [
+    ('mappers', {}),
+    ('mappers, no xml', {'keep_xml': False}),
+    ('records', {'compact': True}),
+    ('records, no xml', {'compact': True, 'keep_xml': False}),
+]
+
+
+def connections(count):
+    return '<connections total="%d">%s</connections>' % (
+        count, ''.join(standin.person_xml('c%d' % i) for i in xrange(count)))
+
+
+def network(count):
+    stamps = [1300000000000 + i * 3600000 for i in xrange(count)]
+    return '<network><updates total="%d">%s</updates></network>' % (
+        count, ''.join(standin.update_xml(s, standin.update_type(s, 3600000)) for s in stamps))
+
+
+def resident():
+    gc.collect()
+    try:
+        # hand freed heap memory back so it doesn't count as held
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize()
+
+
+def python_size(obj, seen):
+    """
+    Bytes taken by "obj" and the Python objects it references, each counted
+    once.  Classes, modules and lxml elements are not counted.
+    """
+    if id(obj) in seen or isinstance(obj, (type, types.ModuleType, etree._Element)):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(python_size(k, seen) + python_size(v, seen) for k, v in obj.iteritems())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(python_size(o, seen) for o in obj)
+    else:
+        if hasattr(obj, '__dict__'):
+            size += python_size(obj.__dict__, seen)
+        for cls in type(obj).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if hasattr(obj, name):
+                    size += python_size(getattr(obj, name), seen)
+    return size
+
+
+def measure(kind, options, count):
+    content = (connections if kind == 'profile' else network)(count)
+    before = resident()
+    objects = LinkedInXMLParser(content, **options).results['results']
+    after = resident()
+    assert len(objects) == count
+    return (after - before) / count, python_size(objects, set()) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--count', type=int, default=5000, help='objects decoded per variant')
+    parser.add_argument('--measure', nargs=2, metavar=('KIND', 'VARIANT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        kind, variant = args.measure
+        print '%d %d' % measure(kind, dict(VARIANTS)[variant], args.count)
+        return
+
+    print 'bytes per object     %12s %12s %12s %12s' % ('profile RSS', 'profile py', 'update RSS', 'update py')
+    for variant, options in VARIANTS:
+        sizes = []
+        for kind in ('profile', 'update'):
+            output = subprocess.check_output([sys.executable, __file__, '--count', str(args.count),
+                                              '--measure', kind, variant])
+            sizes.extend(int(n) for n in output.split())
+        print '%-20s %12d %12d %12d %12d' % tuple([variant] + sizes)
+
+
+if __name__ == '__main__':
+    main()
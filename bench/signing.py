@@ -0,0 +1,53 @@
+#! usr/bin/env python
+"""
+Cost of OAuth signing per request: Client.sign() one request at a time,
+Client.sign_many() for a batch, and signing with a key that isn't cached
+yet (a new consumer and token pair each time).  Nothing is sent; only
+building, normalizing and signing the requests is timed.
+
+    python bench/signing.py --requests 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from liclient import oauth2 as oauth
+
+URL = 'http://api.linkedin.com/v1/people/~/network/updates?count=50&scope=self&type=STAT&type=CONN'
+
+
+def timed(fn, count):
+    start = time.time()
+    fn()
+    return (time.time() - start) / count * 1000000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--requests', type=int, default=5000, help='requests signed per run')
+    args = parser.parse_args()
+
+    count = args.requests
+    client = oauth.Client(oauth.Consumer('key', 'secret'), oauth.Token('token', 'token secret'))
+    batch = [(URL, 'GET', None, None)] * count
+
+    def sign():
+        for _ in xrange(count):
+            client.sign(URL)
+
+    def sign_uncached():
+        for i in xrange(count):
+            client.token = oauth.Token('token', 'token secret %d' % i)
+            client.sign(URL)
+
+    print '%-16s %10s' % ('signing', 'us/request')
+    print '%-16s %10.1f' % ('sign', timed(sign, count))
+    print '%-16s %10.1f' % ('sign_many', timed(lambda: client.sign_many(batch), count))
+    print '%-16s %10.1f' % ('uncached key', timed(sign_uncached, count))
+
+
+if __name__ == '__main__':
+    main()
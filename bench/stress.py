@@ -0,0 +1,223 @@
+#! usr/bin/env python
+"""
+Concurrency stress test for one LinkedInAPI shared by many threads, against
+the local stand-in server (liclient.standin).  "--threads" threads share a
+single client -- its client pool, worker pool, response cache and search
+cache -- and make a random mix of calls for "--seconds".  Every result is
+checked against what the stand-in serves for that call, and the argument
+dicts and lists the threads share against their original values.  Observers
+are added and removed while the calls run.  Exits with status 1 if any
+check failed.  Once the threads are done, the windowed network update
+iterator is checked against a single fetch over the same range.
+
+    python bench/stress.py --threads 32 --seconds 10 --latency 0.005
+"""
+import argparse
+import copy
+import datetime
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from liclient import LinkedInAPI
+from liclient.cache import ResponseCache, SearchCache
+from liclient.standin import StandInServer
+
+CONSUMER = ('stress-key', 'stress-secret')
+TOKEN = {'oauth_token': 'stress-token', 'oauth_token_secret': 'stress-token-secret'}
+SELECTORS = ['id', 'first-name', 'last-name', 'headline', 'location', 'positions']
+CONNECTIONS = 500
+SEARCH_RESULTS = 200
+
+# arguments shared by every thread, checked against SNAPSHOT once the run is over
+MEMBERS = ['m%d' % i for i in range(200)]
+UPDATE_KWARGS = {'type': ['STAT', 'CONN']}
+SEARCHES = [
+    {'keywords': ['python', 'developer'], 'current_title': 'true'},
+    {'keywords': 'java', 'network': 'in', 'count': 25},
+    {'keywords': 'python developer', 'current-title': True},
+    {'keywords': ['data', 'engineer'], 'sort_criteria': 'relevance'},
+]
+SNAPSHOT = copy.deepcopy((MEMBERS, UPDATE_KWARGS, SEARCHES))
+
+
+def search_ids(query, start=0, count=SEARCH_RESULTS):
+    # the people the stand-in finds for a search; see StandInHandler.people_search
+    keywords = query.get('keywords', '')
+    if not isinstance(keywords, basestring):
+        keywords = ' '.join(keywords)
+    shift = zlib.crc32(' '.join(keywords.split())) % 100
+    return ['srch%d' % (i + shift) for i in range(start, min(start + count, SEARCH_RESULTS))]
+
+
+def check(condition, message):
+    if not condition:
+        raise AssertionError(message)
+
+
+def profile(api, rnd):
+    member = rnd.choice(MEMBERS)
+    resp, data = api.get_user_profile(TOKEN, SELECTORS, id=[member])
+    check(data['id'] == member, 'profile %s returned %s' % (member, data['id']))
+
+
+def profiles(api, rnd):
+    start = rnd.randrange(len(MEMBERS))
+    ids = MEMBERS[start:start + 40]
+    found = api.get_user_profiles(TOKEN, ids, SELECTORS)
+    check(sorted(found) == sorted(ids), 'profiles %s returned %s' % (ids, sorted(found)))
+    check(all(p.id == i for i, p in found.items()), 'profiles keyed by the wrong id')
+
+
+def connections(api, rnd):
+    start = rnd.randrange(0, CONNECTIONS, 10)
+    total, people = api.get_connections_page(TOKEN, SELECTORS, start, 50)
+    expected = ['conn%d' % i for i in range(start, min(start + 50, CONNECTIONS))]
+    check(total == CONNECTIONS, 'connections total %s' % total)
+    check([p.id for p in people] == expected, 'connections page at %d' % start)
+
+
+def updates(api, rnd):
+    before = datetime.datetime.now() - datetime.timedelta(hours=rnd.randrange(48))
+    after = before - datetime.timedelta(days=1)
+    page = api.get_network_updates_page(TOKEN, after, before, 0, 50, UPDATE_KWARGS)
+    low, high = api.dt_obj_to_string(after), api.dt_obj_to_string(before)
+    for u in page['results']:
+        check(u.update_key.split('-')[0] in UPDATE_KWARGS['type'], 'update of type %s' % u.update_key)
+        check(low <= u.timestamp <= high, 'update %s outside its window' % u.update_key)
+
+
+def search(api, rnd):
+    query = rnd.choice(SEARCHES)
+    start = rnd.randrange(0, SEARCH_RESULTS, 10)
+    count = query.get('count', 10)
+    stream = rnd.random() < 0.5
+    results = api.search(TOKEN, dict(query, start=start), stream=stream)
+    ids = [p.id for p in results] if stream else [p[0].id for p in results]
+    check(ids == search_ids(query, start, count), 'search %r at %d' % (query, start))
+
+
+def iter_search(api, rnd):
+    query = rnd.choice(SEARCHES)
+    limit = rnd.randrange(1, 60)
+    format = rnd.choice([None, 'json'])
+    ids = [p.id for p in api.iter_search(TOKEN, query, page_size=10, limit=limit, format=format)]
+    check(ids == search_ids(query)[:limit], 'iter_search %r up to %d' % (query, limit))
+
+
+def search_many(api, rnd):
+    queries = rnd.sample(SEARCHES, 3)
+    merged = api.search_many(TOKEN, queries, limit=30)
+    expected = {}
+    for i, q in enumerate(queries):
+        for member in search_ids(q)[:30]:
+            expected.setdefault(member, []).append(i)
+    found = dict((p.id, matched) for p, matched in merged)
+    check(len(found) == len(merged), 'search_many returned duplicates')
+    check(found == expected, 'search_many %r' % queries)
+
+
+def observers(api, rnd):
+    observer = lambda record: None
+    api.add_observer(observer)
+    profile(api, rnd)
+    api.remove_observer(observer)
+
+
+CALLS = [profile, profiles, connections, updates, search, iter_search, search_many, observers]
+
+
+def windowed_updates(api):
+    # a range cut into windows on update stamps returns what a single fetch does
+    hour = 3600 * 1000
+    before = int(time.time() * 1000) // hour * hour
+    after = before - 3 * 24 * hour
+    for format in (None, 'json'):
+        single = api.get_network_updates(TOKEN, after=after, before=before, count=1000, format=format)['results']
+        windowed = list(api.iter_network_updates(TOKEN, after, before, format=format))
+        check(sorted(u.update_key for u in windowed) == sorted(u.update_key for u in single),
+              'iter_network_updates returned %d updates, a single fetch %d' % (len(windowed), len(single)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--threads', type=int, default=32, help='threads sharing the client')
+    parser.add_argument('--seconds', type=float, default=10, help='how long to run')
+    parser.add_argument('--latency', type=float, default=0.005, help='stand-in latency in seconds')
+    parser.add_argument('--max-concurrency', type=int, default=16, help="the client's pool sizes")
+    parser.add_argument('--seed', type=int, default=None, help='seed for the mix of calls')
+    args = parser.parse_args()
+
+    server = StandInServer(consumers=dict([CONSUMER]), tokens={TOKEN['oauth_token']: TOKEN['oauth_token_secret']},
+                           latency=args.latency, connections=CONNECTIONS, search_results=SEARCH_RESULTS).start()
+    api = LinkedInAPI(CONSUMER[0], CONSUMER[1], max_concurrency=args.max_concurrency, api_url=server.url,
+                      response_cache=ResponseCache(), search_cache=SearchCache(ttl=1))
+    recorded = [0]
+    lock = threading.Lock()
+
+    def count(record):
+        with lock:
+            recorded[0] += 1
+    api.add_observer(count)
+
+    stats = dict((c.__name__, [0, 0]) for c in CALLS)
+    failures = []
+    deadline = time.time() + args.seconds
+
+    def worker(seed):
+        rnd = random.Random(seed)
+        while time.time() < deadline:
+            call = rnd.choice(CALLS)
+            try:
+                call(api, rnd)
+                failed = 0
+            except Exception:
+                failed = 1
+                with lock:
+                    failures.append(traceback.format_exc())
+            with lock:
+                stats[call.__name__][0] += 1
+                stats[call.__name__][1] += failed
+
+    seeder = random.Random(args.seed)
+    threads = [threading.Thread(target=worker, args=(seeder.random(),)) for i in range(args.threads)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start
+
+    print '%-14s %8s %8s' % ('call', 'calls', 'failed')
+    for c in CALLS:
+        calls, failed = stats[c.__name__]
+        print '%-14s %8d %8d' % (c.__name__, calls, failed)
+    calls = sum(s[0] for s in stats.values())
+    print '%d calls in %.1fs (%.0f/s), %d requests served, %d calls observed' % (
+        calls, elapsed, calls / elapsed, server.requests, recorded[0])
+
+    try:
+        windowed_updates(api)
+    except Exception:
+        failures.append(traceback.format_exc())
+    if (MEMBERS, UPDATE_KWARGS, SEARCHES) != SNAPSHOT:
+        failures.append('shared arguments were changed')
+    if api.observers != (count,):
+        failures.append('observers left registered: %r' % (api.observers,))
+    for f in failures[:5]:
+        print f
+    api.close()
+    server.stop()
+    if failures:
+        print '%d checks failed' % len(failures)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#! usr/bin/env python
+"""
+End-to-end throughput benchmark for LinkedInAPI against the local stand-in
+server (liclient.standin).  Every API method is called "--requests" times
+from "--concurrency" threads; requests per second and p50/p99 latency are
+reported per method.  The server runs in the same interpreter as the
+client, so the numbers are meant for comparing client revisions against each
+other rather than as absolute figures.
+
+    python bench/throughput.py --requests 500 --concurrency 16 --latency 0.01
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from liclient import LinkedInAPI
+from liclient.standin import StandInServer
+
+CONSUMER = ('bench-key', 'bench-secret')
+TOKEN = {'oauth_token': 'bench-token', 'oauth_token_secret': 'bench-token-secret'}
+SELECTORS = ['id', 'first-name', 'last-name', 'headline', 'location', 'positions', 'educations', 'skills']
+
+METHODS = [
+    ('get_user_profile', lambda api: api.get_user_profile(TOKEN, SELECTORS)),
+    ('get_user_profiles', lambda api: api.get_user_profiles(TOKEN, ['m%d' % i for i in range(25)], SELECTORS)),
+    ('get_user_connections', lambda api: api.get_user_connections(TOKEN, SELECTORS, count=100)),
+    ('get_connections_page', lambda api: api.get_connections_page(TOKEN, SELECTORS, 0, 100)),
+    ('get_network_updates', lambda api: api.get_network_updates(TOKEN, count=50)),
+    ('get_comment_feed', lambda api: api.get_comment_feed(TOKEN, 'STAT-1')),
+    ('search', lambda api: api.search(TOKEN, {'first-name': 'John', 'count': 25})),
+    ('send_message', lambda api: api.send_message(TOKEN, ['m1', 'm2'], 'Subject', 'Body')),
+    ('share', lambda api: api.share(TOKEN, {'comment': 'Benchmark', 'visibility': {'code': 'anyone'}})),
+    ('set_status_update', lambda api: api.set_status_update(TOKEN, 'Benchmarking')),
+    ('submit_comment', lambda api: api.submit_comment(TOKEN, 'STAT-1', 'Comment')),
+]
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run(api, call, requests, concurrency):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def worker():
+        while True:
+            with lock:
+                if not remaining[0]:
+                    return
+                remaining[0] -= 1
+            start = time.time()
+            try:
+                call(api)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+            with lock:
+                latencies.append(time.time() - start)
+
+    threads = [threading.Thread(target=worker) for i in range(concurrency)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.time() - start
+    latencies.sort()
+    return requests / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99), errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--requests', type=int, default=200, help='calls per method')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--latency', type=float, default=0, help='stand-in latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of 503 responses')
+    parser.add_argument('--methods', nargs='*', help='only benchmark these methods')
+    args = parser.parse_args()
+
+    server = StandInServer(consumers=dict([CONSUMER]), tokens={TOKEN['oauth_token']: TOKEN['oauth_token_secret']},
+                           latency=args.latency, error_rate=args.error_rate).start()
+    api = LinkedInAPI(CONSUMER[0], CONSUMER[1], max_concurrency=args.concurrency, api_url=server.url)
+
+    print '%-22s %10s %10s %10s %7s' % ('method', 'req/s', 'p50 ms', 'p99 ms', 'errors')
+    for name, call in METHODS:
+        if args.methods and name not in args.methods:
+            continue
+        call(api)  # warm up the connection pool
+        rps, p50, p99, errors = run(api, call, args.requests, args.concurrency)
+        print '%-22s %10.1f %10.2f %10.2f %7d' % (name, rps, p50 * 1000, p99 * 1000, errors)
+    api.close()
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
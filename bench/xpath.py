@@ -0,0 +1,87 @@
+#! usr/bin/env python
+"""
+Micro-benchmark for the shared XPath catalog (liclient.parsers.xpaths).
+For each parser and mapper class it reports how long compiling the class's
+own XPath expressions takes -- what every constructor paid before the
+catalog -- next to how long building one object (children included) takes
+now that the compiled expressions are shared.
+
+    python bench/xpath.py --repeat 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from lxml import etree
+
+from liclient import standin
+from liclient.parsers import lixml, mappers
+from liclient.parsers.xpaths import XPATHS
+
+STAMP = 1300000000000
+
+
+def network(u_type):
+    return etree.fromstring('<network><updates total="1">%s</updates></network>' % standin.update_xml(STAMP, u_type))
+
+
+def sample_objects():
+    person = etree.fromstring(standin.person_xml('m1'))
+    comment = etree.fromstring(standin.comment_xml('STAT-1', 0))
+    rows = [
+        (mappers.Profile, lambda: lixml.LinkedInXMLParser(person)),
+        (lixml.LinkedInPositionParser, lambda: lixml.LinkedInXMLParser(person.find('positions/position'))),
+        (lixml.LinkedInEducationParser, lambda: lixml.LinkedInXMLParser(person.find('educations/education'))),
+        (lixml.LinkedInSkillsParser, lambda: lixml.LinkedInXMLParser(person.find('skills/skill'))),
+        (mappers.NetworkUpdateComment, lambda: mappers.NetworkUpdateComment(comment)),
+    ]
+    for u_type, cls in [('STAT', mappers.NetworkStatusUpdate), ('CONN', mappers.NetworkConnectionUpdate),
+                        ('JGRP', mappers.NetworkGroupUpdate), ('QSTN', mappers.NetworkQuestionUpdate),
+                        ('ANSW', mappers.NetworkAnswerUpdate)]:
+        tree = network(u_type)
+        rows.append((cls, lambda tree=tree: lixml.LinkedInXMLParser(tree)))
+    return rows
+
+
+def expressions(cls):
+    """
+    The XPath sources a class holds, either as attributes or in its
+    xpath_collection.
+    """
+    found = set()
+    for name in dir(cls):
+        value = getattr(cls, name)
+        if isinstance(value, etree.XPath):
+            found.add(value.path)
+        elif name == 'xpath_collection':
+            found.update(x.path for x in value.values())
+    return sorted(found)
+
+
+def timed(fn, repeat):
+    start = time.time()
+    for _ in xrange(repeat):
+        fn()
+    return (time.time() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=1000, help='constructions per class')
+    args = parser.parse_args()
+
+    print '%-32s %6s %12s %14s' % ('class', 'paths', 'compile us', 'construct us')
+    for cls, build in sample_objects():
+        paths = expressions(cls)
+        compile_us = timed(lambda: [etree.XPath(p) for p in paths], args.repeat)
+        construct_us = timed(build, args.repeat)
+        print '%-32s %6d %12.1f %14.1f' % (cls.__name__, len(paths), compile_us, construct_us)
+    print
+    print '%d expressions in the catalog' % len(XPATHS)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,33 +1,50 @@
 #! usr/bin/env python
 
+import collections
 import datetime
+import itertools
 import re
+import threading
 import time
 import urllib
 import urlparse
 import oauth2 as oauth
 
+import httplib2
 from httplib2 import HttpLib2ErrorWithResponse
 import json
 
-from parsers.lixml import LinkedInXMLParser
+from parsers.lixml import LinkedInXMLParser, LinkedInProfileStreamParser
+from parsers.lijson import LinkedInJSONParser
+from pool import ClientPool, set_timeout
+from concurrency import WorkerPool
+from instrument import current_record, instrumented, connection_type
+from urls import URL_TEMPLATES
 from lxml import etree
 from lxml.builder import ElementMaker
 
 
 class LinkedInAPI(object):
-    def __init__(self, ck, cs):
+    """
+    One LinkedInAPI can serve any number of threads at once: calls never
+    change the arguments they are passed or the client's own settings, and
+    the client pool, caches and rate limiter they share are thread-safe.
+    """
+    def __init__(self, ck, cs, client_pool=None, max_concurrency=8, response_cache=None,
+                 rate_limiter=None, retry_policy=None, api_url='http://api.linkedin.com',
+                 lazy_profiles=False, compact_records=False, keep_xml=True, search_cache=None):
         self.consumer_key = ck
         self.consumer_secret = cs
 
-        self.api_profile_url = 'http://api.linkedin.com/v1/people/~'
-        self.api_profile_connections_url = 'http://api.linkedin.com/v1/people/~/connections'
-        self.api_network_update_url = 'http://api.linkedin.com/v1/people/~/network'
-        self.api_comment_feed_url = 'http://api.linkedin.com/v1/people/~/network/updates/' + \
+        self.api_url = api_url
+        self.api_profile_url = api_url + '/v1/people/~'
+        self.api_profile_connections_url = api_url + '/v1/people/~/connections'
+        self.api_network_update_url = api_url + '/v1/people/~/network'
+        self.api_comment_feed_url = api_url + '/v1/people/~/network/updates/' + \
             'key={NETWORK UPDATE KEY}/update-comments'
-        self.api_update_status_url = 'http://api.linkedin.com/v1/people/~/current-status'
-        self.api_share = 'http://api.linkedin.com/v1/people/~/shares'
-        self.api_mailbox_url = 'http://api.linkedin.com/v1/people/~/mailbox'
+        self.api_update_status_url = api_url + '/v1/people/~/current-status'
+        self.api_share = api_url + '/v1/people/~/shares'
+        self.api_mailbox_url = api_url + '/v1/people/~/mailbox'
 
         self.base_url = 'https://api.linkedin.com'
         self.li_url = 'http://www.linkedin.com'
@@ -37,18 +54,41 @@ class LinkedInAPI(object):
         self.authorize_path = '/uas/oauth/authorize'
 
         self.consumer = oauth.Consumer(self.consumer_key, self.consumer_secret)
+        # a pool passed in may be shared with other clients; close() leaves it open
+        self.owns_client_pool = client_pool is None
+        if client_pool is None:
+            timeout = retry_policy.timeout if retry_policy else None
+            client_pool = ClientPool(max_size=max_concurrency, timeout=timeout)
+        self.client_pool = client_pool
+        self.executor = WorkerPool(max_concurrency)
+        self.response_cache = response_cache
+        # a cache.SearchCache for search pages, answering repeated searches
+        self.search_cache = search_cache
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.observers = ()
+        self.observer_lock = threading.Lock()
+        # options for decoding XML responses, see parsers.lixml.LinkedInXMLParser
+        self.lazy_profiles = lazy_profiles
+        self.compact_records = compact_records
+        self.keep_xml = keep_xml
+
+        # LinkedIn rejects overlong URLs; leave room for the OAuth parameters
+        # appended to the query string when a GET request is signed
+        self.max_url_length = 2048
+        self.oauth_query_length = 320
 
         self.valid_network_update_codes = ['ANSW', 'APPS', 'CONN', 'JOBS',
                                            'JGRP', 'PICT', 'RECU', 'PRFU',
                                            'QSTN', 'STAT']
 
+    @instrumented
     def get_request_token(self, redirect_url=None):
         """
         Get a request token based on the consumer key and secret to supply the
         user with the authorization URL they can use to give the application
         access to their LinkedIn accounts
         """
-        client = oauth.Client(self.consumer)
         request_token_url = self.base_url + self.request_token_path
 
         additional_param = {}
@@ -58,11 +98,12 @@ class LinkedInAPI(object):
                 'headers': {'Content-Type': 'application/x-www-form-urlencoded'}
             }
 
-        resp, content = client.request(request_token_url, 'POST', **additional_param)
+        resp, content = self.make_request(None, request_token_url, 'POST', endpoint='oauth', **additional_param)
 
         request_token = dict(urlparse.parse_qsl(content))
         return request_token
 
+    @instrumented
     def get_access_token(self, request_token, verifier):
         """
         Get an access token based on the generated request_token and the
@@ -74,13 +115,13 @@ class LinkedInAPI(object):
             request_token['oauth_token_secret']
         )
         token.set_verifier(verifier)
-        client = oauth.Client(self.consumer, token)
         access_token_url = self.base_url + self.access_token_path
 
-        resp, content = client.request(access_token_url, 'POST')
+        resp, content = self.make_request(token, access_token_url, 'POST', endpoint='oauth')
         access_token = dict(urlparse.parse_qsl(content))
         return access_token
 
+    @instrumented
     def get_user_profile(self, access_token, selectors=None, **kwargs):
         """
         Get a user profile.  If keyword argument "id" is not supplied, this
@@ -90,21 +131,78 @@ class LinkedInAPI(object):
         """
 
         # Now using json api - GL
-        kwargs['format'] = 'json'
-        url = self.api_profile_url
+        kwargs = dict(kwargs, format='json')
 
         assert isinstance(selectors, (tuple, list)), '"Keyword argument "selectors" must be of type "list" or "tuple"'
-        if selectors:
-            url = self.prepare_field_selectors(selectors, url)
-
-        user_token, url = self.prepare_request(access_token, url, kwargs)
-        client = oauth.Client(self.consumer, user_token)
-        resp, content = client.request(url, 'GET')
+        user_token, url = self.prepare_request(access_token, self.api_profile_url, kwargs, selectors)
+        resp, content = self.make_request(user_token, url, 'GET', endpoint='profile')
 
         if resp.status >= 500:
             raise HttpLib2ErrorWithResponse(resp.reason, resp, content)
-        return resp, json.loads(content)
+        return resp, self.decode_json(content)
 
+    @instrumented
+    def get_user_profiles(self, access_token, ids, selectors):
+        """
+        Get the profiles of many members at once.  "ids" is a list of member
+        IDs of any length; it is split into batches that keep each
+        people::(id=...,id=...) URL under the URL length limit, and the batches
+        are fetched concurrently.  Returns a dict mapping each ID to its
+        Profile object.  The "id" field selector is added if it is missing.
+        """
+        assert isinstance(ids, (tuple, list)), 'Argument "ids" must be of type "list" or "tuple"'
+        assert isinstance(selectors, (tuple, list)), 'Argument "selectors" must be of type "list" or "tuple"'
+        selectors = list(selectors)
+        if 'id' not in selectors:
+            selectors.insert(0, 'id')
+
+        futures = [self.executor.submit(self.get_profile_batch, access_token, batch, selectors)
+                   for batch in self.batch_ids(ids, selectors)]
+        profiles = {}
+        for f in futures:
+            for p in f.result():
+                profiles[p.id] = p
+        return profiles
+
+    @instrumented
+    def get_profile_batch(self, access_token, ids, selectors):
+        user_token, url = self.prepare_request(access_token, self.api_profile_url, {'id': ids}, selectors)
+        resp, content = self.make_request(user_token, url, 'GET', endpoint='profile')
+
+        if resp.status >= 400:
+            raise HttpLib2ErrorWithResponse(resp.reason, resp, content)
+        record = current_record()
+        with record.phase('parse'):
+            tree = etree.fromstring(content)
+        with record.phase('map'):
+            if tree.tag == 'person':
+                return LinkedInXMLParser(tree, **self.xml_options()).results
+            return [LinkedInXMLParser(p, **self.xml_options()).results[0] for p in tree.iterchildren('person')]
+
+    def batch_ids(self, ids, selectors):
+        """
+        Split a list of member IDs into batches whose people::(...) URL stays
+        under self.max_url_length.  Duplicate IDs are dropped.
+        """
+        url = self.prepare_field_selectors(selectors, self.api_profile_url.replace('/~', '::()'))
+        base_length = len(url) + self.oauth_query_length
+        batches = []
+        batch, length, seen = [], base_length, set()
+        for i in ids:
+            if i in seen:
+                continue
+            seen.add(i)
+            id_length = len('id=,') + len(i)
+            if batch and length + id_length > self.max_url_length:
+                batches.append(batch)
+                batch, length = [], base_length
+            batch.append(i)
+            length += id_length
+        if batch:
+            batches.append(batch)
+        return batches
+
+    @instrumented
     def get_user_connections(self, access_token, selectors=None, **kwargs):
         """
         Get the connections of the current user.  Valid keyword arguments are
@@ -114,53 +212,183 @@ class LinkedInAPI(object):
         """
 
         # Now using json api - GL
-        kwargs['format'] = 'json'
+        kwargs = dict(kwargs, format='json')
 
-        if selectors:
-            url = self.prepare_field_selectors(selectors, self.api_profile_connections_url)
-
-        user_token, url = self.prepare_request(access_token, url, kwargs)
-        client = oauth.Client(self.consumer, user_token)
-        resp, content = client.request(url, 'GET')
+        user_token, url = self.prepare_request(access_token, self.api_profile_connections_url, kwargs, selectors)
+        resp, content = self.make_request(user_token, url, 'GET', endpoint='connections')
 
         if resp.status >= 500:
             raise HttpLib2ErrorWithResponse(resp.reason, resp, content)
-        return resp, json.loads(content)
+        return resp, self.decode_json(content)
+
+    def iter_user_connections(self, access_token, selectors=None, page_size=100):
+        """
+        Iterate over all connections of the current user, yielding one Profile
+        object at a time.  Connections are fetched "page_size" at a time and
+        the next page is requested while the current one is being consumed.
+        Pages are parsed incrementally, so only the profiles handed out so far
+        are ever built.  Iteration stops once the "total" reported by LinkedIn
+        is reached.
+        """
+        start = 0
+        # LinkedInAPI's own method, which AsyncLinkedInAPI doesn't wrap in a Future
+        page = self.executor.submit(LinkedInAPI.get_connections_page, self, access_token, selectors, start,
+                                    page_size, True)
+        while page is not None:
+            # the page is parsed here, in the thread iterating over it
+            profiles = page.result()
+            start += page_size
+            if start < int(profiles.total):
+                page = self.executor.submit(LinkedInAPI.get_connections_page, self, access_token, selectors, start,
+                                            page_size, True)
+            else:
+                page = None
+            for p in profiles:
+                yield p
+
+    @instrumented
+    def get_connections_page(self, access_token, selectors, start, count, stream=False):
+        """
+        Fetch one page of connections as XML.  Returns the total number of
+        connections and the list of Profile objects on the page.  With
+        "stream", a LinkedInProfileStreamParser building them one at a time is
+        returned instead, its "total" giving the number of connections.
+        """
+        user_token, url = self.prepare_request(access_token, self.api_profile_connections_url,
+                                               {'start': start, 'count': count}, selectors)
+        resp, content = self.make_request(user_token, url, 'GET', endpoint='connections')
+
+        if resp.status >= 400:
+            raise HttpLib2ErrorWithResponse(resp.reason, resp, content)
+        if stream:
+            return self.decode_xml_stream(content)
+        results = self.decode_xml(content)
+        return int(results['total']), results['results']
 
+    @instrumented
     def get_network_updates(self, access_token, **kwargs):
         """Get network updates for the current user.  Valid keyword arguments are
         "count", "start", "type", "before", and "after".  "Count" and "start" are for the number
         of updates to be returned.  "Type" specifies what type of update you are querying.
         "Before" and "after" set the time interval for the query.  Valid argument types are
         an integer representing UTC with millisecond precision or a Python datetime object.
+        With format='json' the updates are fetched and decoded as JSON, which is cheaper
+        than XML for large pages; the same objects are returned either way.
         """
-        if 'type' in kwargs.keys():
-            assert isinstance(kwargs['type'], (tuple, list)), 'Keyword argument "type" must be of type "list"'
-            [self.check_network_code(c) for c in kwargs['type']]
+        resp, content = self.request_network_updates(access_token, kwargs)
 
-        if 'before' in kwargs.keys():
-            kwargs['before'] = self.dt_obj_to_string(kwargs['before']) if kwargs.get('before') else None
-        if 'after' in kwargs.keys():
-            kwargs['after'] = self.dt_obj_to_string(kwargs['after']) if kwargs.get('after') else None
+        if resp.status >= 500:
+            raise HttpLib2ErrorWithResponse(resp.reason, resp, content)
+        return self.decode_results(content, 'network', kwargs.get('format'))
 
-        user_token, url = self.prepare_request(access_token, self.api_network_update_url, kwargs)
-        client = oauth.Client(self.consumer, user_token)
-        resp, content = client.request(url, 'GET')
-        content = self.clean_dates(content)
-        return LinkedInXMLParser(content).results
+    def request_network_updates(self, access_token, kwargs):
+        # "kwargs" may be shared with other threads; the query is a copy
+        query = dict(kwargs)
+        if 'type' in query:
+            assert isinstance(query['type'], (tuple, list)), 'Keyword argument "type" must be of type "list"'
+            [self.check_network_code(c) for c in query['type']]
 
-    def get_comment_feed(self, access_token, network_key):
+        if 'before' in query:
+            query['before'] = self.dt_obj_to_string(query['before']) if query.get('before') else None
+        if 'after' in query:
+            query['after'] = self.dt_obj_to_string(query['after']) if query.get('after') else None
+
+        user_token, url = self.prepare_request(access_token, self.api_network_update_url, query)
+        return self.make_request(user_token, url, 'GET', endpoint='network_updates')
+
+    def iter_network_updates(self, access_token, after, before=None, window=datetime.timedelta(days=1),
+                             page_size=50, prefetch=2, **kwargs):
+        """
+        Iterate over the network updates posted between "after" and "before"
+        (defaults to now), yielding NetworkUpdate objects oldest first.  The
+        time range is walked in windows of "window" (a timedelta); each window
+        is fetched "page_size" updates at a time, with the pages of a window
+        fetched concurrently and up to "prefetch" windows fetched ahead of the
+        one being consumed.  Only the windows in flight are held in memory.
+        Other keyword arguments (e.g. "type") are passed on to the API.
+        """
+        after = long(self.dt_obj_to_string(after))
+        before = long(self.dt_obj_to_string(before)) if before else long(time.time() * 1000)
+        step = long(window.total_seconds() * 1000)
+        assert step > 0, 'Argument "window" must be a positive timedelta'
+
+        def windows():
+            # the API excludes both bounds, so every window after the first
+            # reaches back 1ms to take in the updates stamped on its start
+            start = after
+            while start < before:
+                yield start - 1 if start > after else start, min(start + step, before)
+                start += step
+
+        bounds = windows()
+        pending = collections.deque()
+
+        def fill():
+            while len(pending) <= prefetch:
+                try:
+                    start, end = bounds.next()
+                except StopIteration:
+                    return
+                pending.append(self.executor.submit(self.get_network_update_window,
+                                                    access_token, start, end, page_size, kwargs))
+
+        fill()
+        previous = set()
+        while pending:
+            updates = pending.popleft().result()
+            fill()
+            # a server that includes both bounds returns boundary updates twice
+            keys = set()
+            for u in updates:
+                key = getattr(u, 'update_key', None)
+                if key is not None:
+                    if key in previous:
+                        continue
+                    keys.add(key)
+                yield u
+            previous = keys
+
+    def get_network_update_window(self, access_token, after, before, page_size, kwargs):
+        """
+        Fetch every network update between "after" and "before", oldest first.
+        """
+        first = self.get_network_updates_page(access_token, after, before, 0, page_size, kwargs)
+        total = int(first['total'])
+        pages = [self.executor.submit(self.get_network_updates_page,
+                                      access_token, after, before, start, page_size, kwargs)
+                 for start in xrange(page_size, total, page_size)]
+        updates = first['results']
+        for p in pages:
+            updates.extend(p.result()['results'])
+        # LinkedIn returns the most recent updates first
+        updates.reverse()
+        updates.sort(key=lambda u: getattr(u, 'timestamp', 0))
+        return updates
+
+    @instrumented
+    def get_network_updates_page(self, access_token, after, before, start, count, kwargs):
+        kws = dict(kwargs, after=after, before=before, start=start, count=count)
+        resp, content = self.request_network_updates(access_token, kws)
+        if resp.status >= 400:
+            raise HttpLib2ErrorWithResponse(resp.reason, resp, content)
+        return self.decode_results(content, 'network', kws.get('format'))
+
+    @instrumented
+    def get_comment_feed(self, access_token, network_key, format=None):
         """
         Get a comment feed for a particular network update.  Requires the update key
-        for the network update as returned by the API.
+        for the network update as returned by the API.  With format='json' the feed is
+        fetched and decoded as JSON.
         """
-        url = re.sub(r'\{NETWORK UPDATE KEY\}', network_key, self.api_comment_feed_url)
-        user_token, url = self.prepare_request(access_token, url)
-        client = oauth.Client(self.consumer, user_token)
-        resp, content = client.request(url, 'GET')
-        content = self.clean_dates(content)
-        return LinkedInXMLParser(content).results
+        user_token, url = self.prepare_request(access_token, self.api_comment_feed_url, {'format': format},
+                                               slots={'NETWORK UPDATE KEY': network_key})
+        resp, content = self.make_request(user_token, url, 'GET', endpoint='comments')
+
+        if resp.status >= 500:
+            raise HttpLib2ErrorWithResponse(resp.reason, resp, content)
+        return self.decode_results(content, 'update-comments', format)
 
+    @instrumented
     def submit_comment(self, access_token, network_key, bd):
         """
         Submit a comment to a network update.  Requires the update key for the network
@@ -170,11 +398,12 @@ class LinkedInAPI(object):
         bd_pre_wrapper = '<?xml version="1.0" encoding="UTF-8"?><update-comment><comment>'
         bd_post_wrapper = '</comment></update-comment>'
         xml_request = bd_pre_wrapper + bd + bd_post_wrapper
-        url = re.sub(r'\{NETWORK UPDATE KEY\}', network_key, self.api_comment_feed_url)
-        user_token, url = self.prepare_request(access_token, url)
-        client = oauth.Client(self.consumer, user_token)
-        return client.request(url, method='POST', body=xml_request, headers={'Content-Type': 'application/xml'})
+        user_token, url = self.prepare_request(access_token, self.api_comment_feed_url,
+                                               slots={'NETWORK UPDATE KEY': network_key})
+        return self.make_request(user_token, url, method='POST', body=xml_request, headers={'Content-Type': 'application/xml'},
+                                 endpoint='comments')
 
+    @instrumented
     def set_status_update(self, access_token, bd):
         """
         Set the status for the current user.  The status update body is the last
@@ -187,44 +416,177 @@ class LinkedInAPI(object):
         bd_post_wrapper = '</current-status>'
         xml_request = bd_pre_wrapper + bd + bd_post_wrapper
         user_token, url = self.prepare_request(access_token, self.api_update_status_url)
-        client = oauth.Client(self.consumer, user_token)
-        return client.request(url, method='PUT', body=xml_request)
+        return self.make_request(user_token, url, method='PUT', body=xml_request, endpoint='status')
 
+    @instrumented
     def share(self, access_token, share_content):
         '''
         WARNING: all the parameter of the share content to set should be utf-8
         encoded before passing it to that function
         '''
         user_token, url = self.prepare_request(access_token, self.api_share)
-        client = oauth.Client(self.consumer, user_token)
-        resp, content = client.request(
+        resp, content = self.make_request(
+            user_token,
             url,
             method='POST',
             body=json.dumps(share_content),
             headers={
                 'x-li-format': 'json',
                 'Content-Type': 'application/json'
-            }
+            },
+            endpoint='share'
         )
 
         if resp.status >= 500:
             raise HttpLib2ErrorWithResponse(resp.reason, resp, content)
-        return resp, json.loads(content)
+        return resp, self.decode_json(content)
 
-    def search(self, access_token, data, field_selector_string=None):
+    @instrumented
+    def search(self, access_token, data, field_selector_string=None, stream=False, format=None):
         """
         Use the LinkedIn Search API to find users.  The criteria for your search
         should be passed as the 2nd positional argument as a dictionary of key-
         value pairs corresponding to the paramters allowed by the API.  Formatting
         of arguments will be done for you (i.e. lists of keywords will be joined
-        with "+")
+        with "+").  With "stream", an iterator yielding the matching Profile
+        objects one at a time is returned instead.  With format='json' the results
+        are fetched and decoded as JSON; they can't be streamed then.
         """
-        srch = LinkedInSearchAPI(data, access_token, field_selector_string)
-        client = oauth.Client(self.consumer, srch.user_token)
-        rest, content = client.request(srch.generated_url, method='GET')
+        assert not (stream and format == 'json'), 'Only XML search results can be streamed'
+        if format:
+            data = dict(data, format=format)
+        srch = LinkedInSearchAPI(data, access_token, field_selector_string, self.api_url)
+        resp, content = self.request_search(srch)
         # print content # useful for debugging...
-        return LinkedInXMLParser(content).results
+        if resp.status >= 500 or (stream and resp.status >= 400):
+            raise HttpLib2ErrorWithResponse(resp.reason, resp, content)
+        if stream:
+            return self.decode_xml_stream(content)
+        return self.decode_results(content, 'people-search', format)
+
+    def iter_search(self, access_token, data, field_selector_string=None, page_size=25, prefetch=4,
+                    limit=None, format=None):
+        """
+        Iterate over everyone matching a search, yielding one Profile object
+        at a time in the order LinkedIn ranks them.  The first page gives the
+        number of people matching ("num-results"); the following pages are
+        then fetched "page_size" at a time, with up to "prefetch" pages
+        fetched concurrently ahead of the one being consumed.  "limit" caps
+        the number of profiles returned.  XML pages are parsed incrementally
+        in the iterating thread, as in iter_user_connections; with
+        format='json' they are decoded as they are fetched.
+        """
+        assert prefetch > 0, 'Argument "prefetch" must be a positive integer'
+        stream = format != 'json'
+
+        def fetch(start):
+            # LinkedInAPI's own method, which AsyncLinkedInAPI doesn't wrap in a Future
+            return self.executor.submit(LinkedInAPI.get_search_page, self, access_token, data,
+                                        field_selector_string, start, page_size, stream, format)
+
+        def read(page):
+            if not stream:
+                return page.result()
+            # the page is parsed here, in the thread iterating over it
+            parser = page.result()
+            if parser.total is None:
+                # only given by <num-results>, after the profiles
+                profiles = list(parser)
+                return int(parser.total or 0), profiles
+            return int(parser.total), parser
+
+        total, profiles = read(fetch(0))
+        if limit is not None:
+            total = min(total, limit)
+        starts = iter(xrange(page_size, total, page_size))
+        pending = collections.deque()
+        returned = 0
+        while True:
+            pending.extend(fetch(start) for start in itertools.islice(starts, prefetch - len(pending)))
+            for p in profiles:
+                if returned == total:
+                    return
+                returned += 1
+                yield p
+            if not pending:
+                return
+            profiles = read(pending.popleft())[1]
+
+    def search_many(self, access_token, queries, field_selector_string=None, limit=None, page_size=25,
+                    format=None):
+        """
+        Run many searches at once and merge their results.  "queries" is a
+        list of search criteria dicts, as passed to search().  Each search
+        is paged through on the worker pool as by iter_search, up to "limit"
+        profiles per search, so no more than "max_concurrency" requests are
+        in flight and the rate limiter, if set, paces them all.
+
+        Returns a list of (Profile, query indexes) pairs, one per person: the
+        indexes are those in "queries" of every search that found them.
+        People are ordered by the first search to find them, then by their
+        rank in it.  They are told apart by "id", so field selectors should
+        include it; people without one are never merged.
+        """
+        futures = [self.executor.submit(self.collect_search, access_token, q, field_selector_string,
+                                        limit, page_size, format)
+                   for q in queries]
+        matches = collections.OrderedDict()
+        for i, f in enumerate(futures):
+            for p in f.result():
+                key = getattr(p, 'id', None) or object()
+                match = matches.get(key)
+                if match is None:
+                    matches[key] = (p, [i])
+                elif match[1][-1] != i:
+                    match[1].append(i)
+        return matches.values()
+
+    def collect_search(self, access_token, data, field_selector_string, limit, page_size, format):
+        # runs in a worker, which parses the pages it streams itself
+        return list(self.iter_search(access_token, data, field_selector_string, page_size,
+                                     limit=limit, format=format))
+
+    @instrumented
+    def get_search_page(self, access_token, data, field_selector_string, start, count, stream=False,
+                        format=None):
+        """
+        Fetch one page of people search results.  Returns the number of
+        people matching and the list of Profile objects on the page.  With
+        "stream", a LinkedInProfileStreamParser building them one at a time
+        is returned instead, its "total" giving the number of people matching.
+        """
+        params = dict(data, start=start, count=count)
+        if format:
+            params['format'] = format
+        srch = LinkedInSearchAPI(params, access_token, field_selector_string, self.api_url)
+        resp, content = self.request_search(srch)
+
+        if resp.status >= 400:
+            raise HttpLib2ErrorWithResponse(resp.reason, resp, content)
+        if stream:
+            return self.decode_xml_stream(content)
+        parser = self.parse_results(content, 'people-search', format)
+        return parser.total, [p[0] for p in parser.results]
 
+    def request_search(self, srch):
+        """
+        Send the request for a LinkedInSearchAPI, answering it from the
+        search cache while fresh if one is set.
+        """
+        cache = self.search_cache
+        if cache is None:
+            return self.make_request(srch.user_token, srch.generated_url, method='GET', endpoint='search')
+        key = cache.key(srch.user_token, srch.generated_url)
+        resp, content, how = cache.fetch(key, lambda: self.make_request(srch.user_token, srch.generated_url,
+                                                                        method='GET', endpoint='search'))
+        record = current_record()
+        if how != 'miss':
+            record.request('search', 'GET', srch.generated_url)
+            record.status = resp.status
+        record.cache = how
+        return resp, content
+
+    @instrumented
     def send_message(self, access_token, recipients, subject, body):
         """
         Send a message to a connection.  "Recipients" is a list of ID numbers,
@@ -235,9 +597,10 @@ class LinkedInAPI(object):
         assert isinstance(recipients, (tuple, list)), '"Recipients argument" (2nd position) must be of type "list"'
         mxml = self.message_factory(recipients, subject, body)
         user_token, url = self.prepare_request(access_token, self.api_mailbox_url)
-        client = oauth.Client(self.consumer, user_token)
-        return client.request(url, method='POST', body=mxml, headers={'Content-Type': 'application/xml'})
+        return self.make_request(user_token, url, method='POST', body=mxml, headers={'Content-Type': 'application/xml'},
+                                 endpoint='mailbox')
 
+    @instrumented
     def send_invitation(self, access_token, recipients, subject, body, **kwargs):
         """
         Send an invitation to a user.  "Recipients" is an ID number OR email address
@@ -258,66 +621,215 @@ class LinkedInAPI(object):
             mxml = self.invitation_factory(recipients, subject, body,
                                         name=kwargs['name'], value=kwargs['value'])
         user_token, url = self.prepare_request(access_token, self.api_mailbox_url)
-        client = oauth.Client(self.consumer, user_token)
-        return client.request(url, method='POST', body=mxml, headers={'Content-Type': 'application/xml'})
+        return self.make_request(user_token, url, method='POST', body=mxml, headers={'Content-Type': 'application/xml'},
+                                 endpoint='mailbox')
+
+    def decode_json(self, content):
+        with current_record().phase('parse'):
+            return json.loads(content)
+
+    def decode_xml(self, content):
+        record = current_record()
+        with record.phase('parse'):
+            tree = etree.fromstring(content)
+        with record.phase('map'):
+            return LinkedInXMLParser(tree, **self.xml_options()).results
+
+    def decode_results(self, content, root, format=None):
+        """
+        Decode a response requested in "format" ('json', or XML by default)
+        into mapper objects.  "root" is the root tag of the XML document; see
+        parsers.lijson.LinkedInJSONParser for JSON responses.
+        """
+        if format != 'json':
+            return self.decode_xml(content)
+        return self.parse_results(content, root, format).results
 
-    def prepare_request(self, access_token, url, kws={}):
+    def parse_results(self, content, root, format=None):
+        """
+        As decode_results, but returns the parser rather than its results,
+        e.g. to read the "total" of a search.
+        """
+        record = current_record()
+        if format != 'json':
+            with record.phase('parse'):
+                tree = etree.fromstring(content)
+            with record.phase('map'):
+                return LinkedInXMLParser(tree, **self.xml_options())
+        with record.phase('parse'):
+            data = json.loads(content)
+        with record.phase('map'):
+            return LinkedInJSONParser(data, root, compact=self.compact_records)
+
+    def xml_options(self):
+        return {'lazy': self.lazy_profiles, 'compact': self.compact_records, 'keep_xml': self.keep_xml}
+
+    def decode_xml_stream(self, content):
+        """
+        Incrementally decode a collection of profiles; see
+        parsers.lixml.LinkedInProfileStreamParser.
+        """
+        with current_record().phase('parse'):
+            return LinkedInProfileStreamParser(content, **self.xml_options())
+
+    def add_observer(self, observer):
+        """
+        Register a callable that is passed a CallRecord (see
+        liclient.instrument) with the endpoint, status, response size and
+        per-phase timings of every API call made through this client.
+        """
+        # the tuple is replaced rather than changed, so calls being made
+        # while observers come and go see either the old or the new set
+        with self.observer_lock:
+            self.observers = self.observers + (observer,)
+
+    def remove_observer(self, observer):
+        with self.observer_lock:
+            self.observers = tuple(o for o in self.observers if o != observer)
+
+    def close(self):
+        """
+        Stop the worker threads once the calls already made have finished,
+        and close the idle connections of the client pool unless it was
+        passed in.  The workers also exit once the client is garbage
+        collected or the interpreter exits (see concurrency.WorkerPool), but
+        a client that is done with can be closed, or used as a context
+        manager:
+
+            with LinkedInAPI(consumer_key, consumer_secret) as api:
+                profiles = api.get_user_profiles(token, ids, selectors)
+        """
+        self.executor.shutdown()
+        if self.owns_client_pool:
+            self.client_pool.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def make_request(self, user_token, url, method='GET', body=None, headers=None, endpoint=None):
+        """
+        Sign and send a request with a client checked out of the client pool,
+        so keep-alive connections are reused between calls.  GET requests on
+        an endpoint the response cache is configured for are answered from
+        the cache while fresh, and revalidated once stale.
+        """
+        record = current_record()
+        record.request(endpoint, method, url)
+        cache = self.response_cache
+        if cache is None or not cache.caches(endpoint, method):
+            return self.send_request(user_token, url, method, body, headers)
+
+        key = cache.key(user_token, url)
+        entry = cache.get(key)
+        if entry and entry.is_fresh():
+            record.cache = 'hit'
+            record.status = entry.resp.status
+            return entry.resp, entry.content
+        headers = dict(headers or {})
+        if entry:
+            headers.update(entry.validators())
+        resp, content = self.send_request(user_token, url, method, body, headers)
+        record.cache = 'miss'
+        if resp.status == 304 and entry:
+            record.cache = 'revalidated'
+            cache.refresh(key, endpoint, entry)
+            return entry.resp, entry.content
+        if resp.status == 200:
+            cache.store(key, endpoint, resp, content)
+        return resp, content
+
+    def send_request(self, user_token, url, method, body, headers):
+        """
+        Send a request, retrying transient failures as the retry policy
+        allows if one is set.
+        """
+        policy = self.retry_policy
+        if policy is None:
+            return self.send_paced_request(user_token, url, method, body, headers)
+
+        policy.record_request()
+        attempt = 0
+        while True:
+            try:
+                resp, content = self.send_paced_request(user_token, url, method, body, headers)
+            except Exception, e:
+                if not policy.retries_error(method, e, attempt):
+                    raise
+            else:
+                if not policy.retries_response(method, resp, attempt):
+                    return resp, content
+            time.sleep(policy.backoff(attempt))
+            attempt += 1
+
+    def send_paced_request(self, user_token, url, method, body, headers):
+        """
+        Send a request, pacing it with the rate limiter if one is set.  A
+        request LinkedIn throttled is sent again once its quota allows.
+        """
+        limiter = self.rate_limiter
+        policy = self.retry_policy
+        token_key = user_token.key if user_token else None
+        throttles = 0
+        while True:
+            if limiter is not None:
+                limiter.acquire(self.consumer.key, token_key)
+            with self.client_pool.client(self.consumer, user_token) as client:
+                # the pool may have been passed in, or be shared with clients
+                # using another retry policy
+                set_timeout(client, policy.timeout if policy else self.client_pool.timeout)
+                resp, content = self.send_signed_request(client, url, method, body, headers)
+            if limiter is None or throttles >= limiter.max_throttle_retries or \
+                    not limiter.is_throttle(resp, content):
+                return resp, content
+            limiter.throttled(self.consumer.key, token_key, resp, content)
+            throttles += 1
+
+    def send_signed_request(self, client, url, method, body, headers):
+        record = current_record()
+        with record.phase('sign'):
+            uri, body, headers = client.sign(url, method, body, headers)
+        with record.phase('transfer'):
+            resp, content = httplib2.Http.request(client, uri, method=method, body=body, headers=headers,
+                                                  connection_type=connection_type(uri))
+        record.response(resp, content)
+        return resp, content
+
+    def prepare_request(self, access_token, url, kws=None, selectors=None, slots=None):
+        """
+        Build the token and the URL for a request to the endpoint "url" with
+        field "selectors" and the query parameters in "kws"; an "id" list in
+        "kws" selects other members than the current one, and "slots" gives
+        the values of the endpoint's {NAME} parts.  The URL template of each
+        endpoint and selector set is compiled once (see liclient.urls) and
+        only expanded here.
+        """
         user_token = oauth.Token(access_token['oauth_token'],
                         access_token['oauth_token_secret'])
-        prep_url = url
-        if kws and 'id' in kws.keys():
-            prep_url = self.append_id_args(kws['id'], prep_url)
-            del kws['id']
-        for k in kws:
-            if kws[k]:
-                if '?' not in prep_url:
-                    prep_url = self.append_initial_arg(k, kws[k], prep_url)
-                else:
-                    prep_url = self.append_sequential_arg(k, kws[k], prep_url)
-        prep_url = re.sub('&&', '&', prep_url)
+        params = dict(kws) if kws else {}
+        ids = params.pop('id', None)
+        prep_url = URL_TEMPLATES.get(url, selectors).expand(ids, params, slots)
         return user_token, prep_url
 
     def append_id_args(self, ids, prep_url):
-        assert isinstance(ids, (tuple, list)), 'Keyword argument "id" must be a list'
-        if len(ids) > 1:
-            prep_url = re.sub('/~', '::(', prep_url)  # sub out the ~ if a user wants someone else's profile
-            for i in ids:
-                prep_url += 'id=' + i + ','
-            prep_url = re.sub(',$', ')', prep_url)
-        else:
-            prep_url = re.sub('~', 'id=' + ids[0], prep_url)
-        return prep_url
-
-    def append_initial_arg(self, key, args, prep_url):
-        assert '?' not in prep_url, 'Initial argument has already been applied to %s' % prep_url
-        if isinstance(args, (tuple, list)):
-            prep_url += '?' + key + '=' + str(args[0])
-            if len(args) > 1:
-                prep_url += ''.join(['&' + key + '=' + str(arg) for arg in args[1:]])
-        else:
-            prep_url += '?' + key + '=' + str(args)
-        return prep_url
-
-    def append_sequential_arg(self, key, args, prep_url):
-        if isinstance(args, (tuple, list)):
-            prep_url += '&' + ''.join(['&' + key + '=' + str(arg) for arg in args])
-        else:
-            prep_url += '&' + key + '=' + str(args)
-        return prep_url
+        return URL_TEMPLATES.get(prep_url).expand(ids)
 
     def prepare_field_selectors(self, selectors, url):
-        prep_url = url
-        selector_string = ':('
-        selector_string += ','.join(selectors)
-        selector_string += ')'
-        prep_url += selector_string
-        return prep_url
+        return URL_TEMPLATES.get(url, selectors).url
 
     def check_network_code(self, code):
         if code not in self.valid_network_update_codes:
             raise ValueError('Code %s not a valid update code' % code)
 
     def clean_dates(self, content):
+        """
+        Rewrite every millisecond timestamp in an XML document as a date string.
+        No longer used by the client itself: update and comment timestamps are
+        now decoded as helpers.Timestamp values while the mappers are built.
+        """
         data = etree.fromstring(content)
         for d in data.iter(tag=etree.Element):
             try:
@@ -333,7 +845,7 @@ class LinkedInAPI(object):
         if isinstance(dtobj, (int, str, long)):
             return dtobj
         elif hasattr(dtobj, 'timetuple'):
-            return time.mktime(int(dtobj.timetuple()) * 1000)
+            return int(time.mktime(dtobj.timetuple()) * 1000)
         else:
             raise TypeError('Inappropriate argument type - use either a datetime object, \
                             string, or integer for timestamps')
@@ -404,19 +916,32 @@ class LinkedInAPI(object):
 
 
 class LinkedInSearchAPI(LinkedInAPI):
-
-    def __init__(self, params, access_token, field_selector_string=None):
-        self.api_search_url = 'http://api.linkedin.com/v1/people-search'
+    """
+    Builds the URL of a people search from its criteria, in a canonical
+    form: criteria are sent under the names LinkedIn expects whichever
+    spelling is used ("current_title" or "current-title"), booleans as
+    "true" or "false" whether given as bools or strings, word lists with
+    single spaces between the words, and the query sorted by name.  Equal
+    searches therefore have equal URLs, which is what the search cache is
+    keyed on.
+    """
+
+    def __init__(self, params, access_token, field_selector_string=None, api_url='http://api.linkedin.com'):
+        self.api_search_url = api_url + '/v1/people-search'
         if field_selector_string:
             self.api_search_url += ':' + field_selector_string
         self.routing = {
             'keywords': self.keywords,
             'name': self.name,
             'current_company': self.current_company,
+            'current-company': self.current_company,
             'current_title': self.current_title,
+            'current-title': self.current_title,
             'location_type': self.location_type,
+            'search-location-type': self.location_type,
             'network': self.network,
-            'sort_criteria': self.sort_criteria
+            'sort_criteria': self.sort_criteria,
+            'sort-criteria': self.sort_criteria
         }
         self.user_token, self.generated_url = self.do_process(access_token, params)
 
@@ -426,55 +951,128 @@ class LinkedInSearchAPI(LinkedInAPI):
             access_token['oauth_token'],
             access_token['oauth_token_secret']
         )
-        url = self.api_search_url
-        for p in params:
+        # each routed parameter gives the (name, value) LinkedIn expects;
+        # the others are sent as they are
+        query = {}
+        for p in sorted(params):
             if self.routing.get(p):
-                self.routing.get(p)(url, params[p])
-                del params[p]
-        url = self.process_remaining_params(url, params)
+                key, value = self.routing.get(p)(params[p])
+                query[key] = value
+            else:
+                query[p] = params[p]
+        url = URL_TEMPLATES.get(self.api_search_url).expand(params=query)
         return user_token, url
 
-    def process_remaining_params(self, prep_url, ps):
-        for p in ps:
-            prep_url = self.append_arg(p, ps[p], prep_url)
-        return prep_url
-
-    def keywords(self, url, ps):
-        return self.list_argument(url, ps, 'keywords')
+    def keywords(self, ps):
+        return self.list_argument(ps, 'keywords')
 
-    def name(self, url, ps):
-        return self.list_argument(url, ps, 'name')
+    def name(self, ps):
+        return self.list_argument(ps, 'name')
 
-    def current_company(self, url, ps):
-        return self.true_false_argument(url, ps, 'current-company')
+    def current_company(self, ps):
+        return self.true_false_argument(ps, 'current-company')
 
-    def current_title(self, url, ps):
-        return self.true_false_argument(url, ps, 'current-title')
+    def current_title(self, ps):
+        return self.true_false_argument(ps, 'current-title')
 
-    def location_type(self, prep_url, ps):
+    def location_type(self, ps):
         assert ps in ('I', 'Y'), 'Valid parameter types for search-location-type are "I" and "Y"'
-        self.append_arg('search-location-type', ps, prep_url)
+        return 'search-location-type', ps
 
-    def network(self, prep_url, ps):
+    def network(self, ps):
         assert ps in ('in', 'out'), 'Valid parameter types for network are "in" and "out"'
-        return self.append_arg('network', ps, prep_url)
+        return 'network', ps
 
-    def sort_criteria(self, prep_url, ps):
+    def sort_criteria(self, ps):
         assert ps in ('recommenders', 'distance', 'relevance'), 'Valid parameter types for sort-criteria \
                             are "recommenders", "distance", and "relevance"'
-        return self.append_arg('sort-criteria', ps, prep_url)
-
-    def true_false_argument(self, prep_url, ps, arg):
-        ps = 'true' if ps else 'false'
-        return self.append_arg(arg, ps, prep_url)
-
-    def list_argument(self, prep_url, ps, arg):
-        li = '+'.join(ps)
-        return self.append_arg(arg, li, prep_url)
-
-    def append_arg(self, key, arg, prep_url):
-        try:
-            prep_url = self.append_initial_arg(key, arg, prep_url)
-        except AssertionError:
-            prep_url = self.append_sequential_arg(key, arg, prep_url)
-        return prep_url
+        return 'sort-criteria', ps
+
+    def true_false_argument(self, ps, arg):
+        if isinstance(ps, basestring):
+            ps = ps.strip().lower() in ('true', '1', 'yes')
+        return arg, 'true' if ps else 'false'
+
+    def list_argument(self, ps, arg):
+        # words are joined with spaces, which are sent as "+"
+        if isinstance(ps, basestring):
+            ps = [ps]
+        return arg, ' '.join(w for p in ps for w in p.split())
+
+
+class AsyncLinkedInAPI(LinkedInAPI):
+    """
+    Same surface as LinkedInAPI, but every request method returns immediately
+    with a Future (see liclient.concurrency) instead of blocking on the
+    network.  The iter_* methods still return iterators, fetching ahead on the
+    worker pool as they do in LinkedInAPI, and the steps they and the fan-out
+    calls run in workers (get_profile_batch, get_network_update_window,
+    get_network_updates_page, collect_search) stay blocking.
+    Calls run on the client's worker pool with pooled keep-alive clients, so
+    at most "max_concurrency" requests are in flight at once, e.g.:
+
+        api = AsyncLinkedInAPI(consumer_key, consumer_secret, max_concurrency=64)
+        futures = [api.get_user_profile(t, ['id', 'headline']) for t in tokens]
+        profiles = [f.result() for f in futures]
+    """
+    def get_request_token(self, redirect_url=None):
+        return self.executor.submit(LinkedInAPI.get_request_token, self, redirect_url)
+
+    def get_access_token(self, request_token, verifier):
+        return self.executor.submit(LinkedInAPI.get_access_token, self, request_token, verifier)
+
+    def get_user_profile(self, access_token, selectors=None, **kwargs):
+        return self.executor.submit(LinkedInAPI.get_user_profile, self,
+                                    access_token, selectors, **kwargs)
+
+    def get_user_profiles(self, access_token, ids, selectors):
+        return self.executor.submit(LinkedInAPI.get_user_profiles, self,
+                                    access_token, ids, selectors)
+
+    def get_user_connections(self, access_token, selectors=None, **kwargs):
+        return self.executor.submit(LinkedInAPI.get_user_connections, self,
+                                    access_token, selectors, **kwargs)
+
+    def get_connections_page(self, access_token, selectors, start, count, stream=False):
+        return self.executor.submit(LinkedInAPI.get_connections_page, self,
+                                    access_token, selectors, start, count, stream)
+
+    def get_network_updates(self, access_token, **kwargs):
+        return self.executor.submit(LinkedInAPI.get_network_updates, self,
+                                    access_token, **kwargs)
+
+    def get_comment_feed(self, access_token, network_key, format=None):
+        return self.executor.submit(LinkedInAPI.get_comment_feed, self,
+                                    access_token, network_key, format)
+
+    def submit_comment(self, access_token, network_key, bd):
+        return self.executor.submit(LinkedInAPI.submit_comment, self,
+                                    access_token, network_key, bd)
+
+    def set_status_update(self, access_token, bd):
+        return self.executor.submit(LinkedInAPI.set_status_update, self, access_token, bd)
+
+    def share(self, access_token, share_content):
+        return self.executor.submit(LinkedInAPI.share, self, access_token, share_content)
+
+    def search(self, access_token, data, field_selector_string=None, stream=False, format=None):
+        return self.executor.submit(LinkedInAPI.search, self,
+                                    access_token, data, field_selector_string, stream, format)
+
+    def search_many(self, access_token, queries, field_selector_string=None, limit=None, page_size=25,
+                    format=None):
+        return self.executor.submit(LinkedInAPI.search_many, self,
+                                    access_token, queries, field_selector_string, limit, page_size, format)
+
+    def get_search_page(self, access_token, data, field_selector_string, start, count, stream=False,
+                        format=None):
+        return self.executor.submit(LinkedInAPI.get_search_page, self,
+                                    access_token, data, field_selector_string, start, count, stream, format)
+
+    def send_message(self, access_token, recipients, subject, body):
+        return self.executor.submit(LinkedInAPI.send_message, self,
+                                    access_token, recipients, subject, body)
+
+    def send_invitation(self, access_token, recipients, subject, body, **kwargs):
+        return self.executor.submit(LinkedInAPI.send_invitation, self,
+                                    access_token, recipients, subject, body, **kwargs)
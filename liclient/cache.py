@@ -0,0 +1,213 @@
+#! usr/bin/env python
+
+import threading
+import time
+import urllib
+import urlparse
+from collections import OrderedDict
+
+from concurrency import Future
+
+# seconds a response stays fresh, by endpoint; endpoints not listed are not cached
+DEFAULT_TTLS = {
+    'profile': 300,
+    'connections': 300,
+    'comments': 60,
+}
+
+
+class CacheEntry(object):
+    def __init__(self, resp, content, expires):
+        self.resp = resp
+        self.content = content
+        self.expires = expires
+        self.etag = resp.get('etag')
+        self.last_modified = resp.get('last-modified')
+
+    def is_fresh(self):
+        return time.time() < self.expires
+
+    def validators(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache(object):
+    """
+    An in-process LRU cache for responses to GET requests on read endpoints.
+
+    Responses are keyed by access token, normalized URL (query arguments
+    sorted) and field selectors (sorted), and stay fresh for the TTL of their
+    endpoint.  Stale entries carrying an ETag or Last-Modified header are
+    revalidated with a conditional request instead of being refetched.  At
+    most "max_entries" responses are kept; the least recently used ones are
+    dropped first.  Hit, miss and revalidation counts are kept in "stats".
+
+    httplib2's own cache can't be used for this, since signed GET requests
+    carry a fresh nonce and timestamp in their query string.
+    """
+    def __init__(self, max_entries=1024, ttls=None):
+        self.max_entries = max_entries
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls:
+            self.ttls.update(ttls)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'evictions': 0}
+
+    def caches(self, endpoint, method='GET'):
+        return method == 'GET' and self.ttls.get(endpoint, 0) > 0
+
+    def key(self, token, url):
+        scheme, netloc, path, params, query, fragment = urlparse.urlparse(url)
+        path, selectors = split_selectors(path)
+        query = urllib.urlencode(sorted(urlparse.parse_qsl(query, True)))
+        url = urlparse.urlunparse((scheme, netloc, path, params, query, ''))
+        return (token.key if token else None, url, selectors)
+
+    def get(self, key):
+        """
+        Return the entry stored under "key", fresh or stale, or None.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            del self.entries[key]
+            self.entries[key] = entry
+            if entry.is_fresh():
+                self.stats['hits'] += 1
+            else:
+                self.stats['misses'] += 1
+            return entry
+
+    def store(self, key, endpoint, resp, content):
+        entry = CacheEntry(resp, content, time.time() + self.ttls.get(endpoint, 0))
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = entry
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        return entry
+
+    def refresh(self, key, endpoint, entry):
+        """
+        Mark a stale entry fresh again after a 304 Not Modified response.
+        """
+        with self.lock:
+            entry.expires = time.time() + self.ttls.get(endpoint, 0)
+            self.stats['revalidated'] += 1
+
+    def invalidate(self, token=None):
+        """
+        Drop all entries, or only those of the given access token.
+        """
+        with self.lock:
+            if token is None:
+                self.entries.clear()
+            else:
+                for key in [k for k in self.entries if k[0] == token.key]:
+                    del self.entries[key]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class SearchCache(ResponseCache):
+    """
+    A cache for the pages of people searches, keyed like ResponseCache on
+    the search URL -- which LinkedInSearchAPI builds from the canonical form
+    of the search criteria, so equal searches share an entry however they
+    were written -- and kept fresh for "ttl" seconds.  With "shared", the
+    entry is shared by every access token rather than kept per member;
+    results then reflect the network of whoever searched first.
+
+    Identical searches made while one is in flight wait for its response
+    rather than sending their own ("single flight"); they are counted as
+    "shared" in "stats".  Only 200 responses are kept, but the ones waiting
+    are handed whatever response came back.
+    """
+    def __init__(self, ttl=300, max_entries=256, shared=False):
+        ResponseCache.__init__(self, max_entries)
+        self.ttls = {'search': ttl}
+        self.shared = shared
+        self.flights = {}
+        self.stats['shared'] = 0
+
+    def key(self, token, url):
+        key = ResponseCache.key(self, token, url)
+        if self.shared:
+            return (None,) + key[1:]
+        return key
+
+    def fetch(self, key, load):
+        """
+        Return the response stored under "key" while fresh; otherwise call
+        "load" for it, once for all the threads asking at the same time.
+        Returns (resp, content, how), "how" being 'hit', 'shared' or 'miss'.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.is_fresh():
+                del self.entries[key]
+                self.entries[key] = entry
+                self.stats['hits'] += 1
+                return entry.resp, entry.content, 'hit'
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = self.flights[key] = Future(self.load, (key, load))
+                self.stats['misses'] += 1
+                how = 'miss'
+            else:
+                self.stats['shared'] += 1
+                how = 'shared'
+        resp, content = flight.result()
+        return resp, content, how
+
+    def load(self, key, load):
+        try:
+            resp, content = load()
+            if resp.status == 200:
+                self.store(key, 'search', resp, content)
+            return resp, content
+        finally:
+            with self.lock:
+                self.flights.pop(key, None)
+
+
+def split_selectors(path):
+    """
+    Split a trailing ":(a,b,...)" field selector group off a URL path and
+    return the bare path along with the sorted tuple of top-level selectors.
+    """
+    if not path.endswith(')') or ':(' not in path:
+        return path, ()
+    depth = 0
+    for i in xrange(len(path) - 1, -1, -1):
+        if path[i] == ')':
+            depth += 1
+        elif path[i] == '(':
+            depth -= 1
+            if depth == 0:
+                break
+    if i == 0 or path[i - 1] != ':':
+        return path, ()
+    selectors, current, depth = [], '', 0
+    for c in path[i + 1:-1]:
+        if c == ',' and depth == 0:
+            selectors.append(current)
+            current = ''
+            continue
+        if c == '(':
+            depth += 1
+        elif c == ')':
+            depth -= 1
+        current += c
+    selectors.append(current)
+    return path[:i - 1], tuple(sorted(selectors))
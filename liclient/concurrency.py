@@ -0,0 +1,148 @@
+#! usr/bin/env python
+
+import atexit
+import sys
+import threading
+import time
+import weakref
+import Queue
+
+PENDING = 'PENDING'
+RUNNING = 'RUNNING'
+FINISHED = 'FINISHED'
+
+
+class Future(object):
+    """
+    The pending result of a call submitted to a WorkerPool.  Calling result()
+    blocks until the call has finished; if no worker has picked the call up
+    yet, the waiting thread runs it itself.  That keeps nested submissions
+    (a pooled call that fans out more pooled calls) from deadlocking a
+    saturated pool.
+    """
+    def __init__(self, fn, args=(), kwargs=None):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.state = PENDING
+        self.value = None
+        self.exc_info = None
+        self.callbacks = []
+        self.condition = threading.Condition()
+
+    def run(self):
+        with self.condition:
+            if self.state != PENDING:
+                return
+            self.state = RUNNING
+        try:
+            value, exc_info = self.fn(*self.args, **self.kwargs), None
+        except:
+            value, exc_info = None, sys.exc_info()
+        with self.condition:
+            self.value = value
+            self.exc_info = exc_info
+            self.state = FINISHED
+            self.fn = self.args = self.kwargs = None
+            self.condition.notify_all()
+            callbacks, self.callbacks = self.callbacks, []
+        for cb in callbacks:
+            cb(self)
+
+    def done(self):
+        return self.state == FINISHED
+
+    def wait(self, timeout=None):
+        if self.state == PENDING:
+            self.run()
+        with self.condition:
+            if self.state != FINISHED:
+                self.condition.wait(timeout)
+            return self.state == FINISHED
+
+    def result(self, timeout=None):
+        if not self.wait(timeout):
+            raise RuntimeError('Timed out waiting for result')
+        if self.exc_info:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+        return self.value
+
+    def exception(self, timeout=None):
+        if not self.wait(timeout):
+            raise RuntimeError('Timed out waiting for result')
+        return self.exc_info and self.exc_info[1]
+
+    def add_done_callback(self, fn):
+        with self.condition:
+            if self.state != FINISHED:
+                self.callbacks.append(fn)
+                return
+        fn(self)
+
+
+class WorkerPool(object):
+    """
+    A bounded pool of daemon worker threads.  At most "max_workers" submitted
+    calls run at the same time; threads are started lazily on demand.  The
+    workers block until there is work and exit on shutdown(), when the pool
+    is garbage collected, or when the interpreter exits, so a pool nobody
+    uses any more doesn't keep its threads.
+    """
+    def __init__(self, max_workers=8):
+        assert max_workers > 0, 'max_workers must be a positive integer'
+        self.max_workers = max_workers
+        self.queue = Queue.Queue()
+        self.workers = []
+        self.lock = threading.Lock()
+        pools.add(self)
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future(fn, args, kwargs)
+        self.queue.put(future)
+        with self.lock:
+            if len(self.workers) < self.max_workers:
+                # the workers only hold the queue, so they don't keep the pool alive
+                worker = threading.Thread(target=work, args=(self.queue,))
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+        return future
+
+    def shutdown(self):
+        """
+        Stop the workers once the calls already submitted have run.  Returns
+        the worker threads.
+        """
+        with self.lock:
+            workers, self.workers = self.workers, []
+        for w in workers:
+            self.queue.put(None)
+        return workers
+
+    def __del__(self):
+        self.shutdown()
+
+
+def work(queue):
+    while True:
+        future = queue.get()
+        if future is None:
+            return
+        future.run()
+        del future
+
+
+# every live WorkerPool, so their workers can be stopped at exit
+pools = weakref.WeakSet()
+
+
+@atexit.register
+def shutdown_pools(grace=1.0):
+    # stop idle workers before the interpreter tears down the modules they
+    # use; workers still busy after "grace" seconds are left to the daemon exit
+    workers = []
+    for pool in list(pools):
+        workers.extend(pool.shutdown())
+    deadline = time.time() + grace
+    for w in workers:
+        w.join(max(deadline - time.time(), 0))
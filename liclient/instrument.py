@@ -0,0 +1,154 @@
+#! usr/bin/env python
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+import httplib2
+
+local = threading.local()
+
+
+class CallRecord(object):
+    """
+    Timing record for one LinkedInAPI call, handed to every observer once the
+    call returns.  "phases" maps phase names to seconds spent in them:
+
+        sign     - building and signing the OAuth request
+        connect  - opening new TCP/TLS connections
+        transfer - sending the request and reading the response
+        parse    - decoding the response body (lxml/json)
+        map      - building the mapper objects
+
+    A call that sends several requests (retries, throttles) adds up the time
+    of all of them; "status" is that of the last response and "bytes" the
+    total size of the response bodies.
+    """
+    def __init__(self, call):
+        self.call = call
+        self.endpoint = None
+        self.method = None
+        self.url = None
+        self.status = None
+        self.bytes = 0
+        self.requests = 0
+        self.cache = None
+        self.error = None
+        self.phases = {}
+        self.start = time.time()
+        self.duration = None
+
+    @contextmanager
+    def phase(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, time.time() - start)
+
+    def add(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0) + seconds
+
+    def request(self, endpoint, method, url):
+        self.endpoint = endpoint
+        self.method = method
+        self.url = url
+
+    def response(self, resp, content):
+        self.status = resp.status
+        self.bytes += len(content or '')
+        self.requests += 1
+
+    def __repr__(self):
+        phases = ', '.join('%s=%.2fms' % (k, v * 1000) for k, v in sorted(self.phases.items()))
+        return '<CallRecord %s %s %s (%d bytes) %s>' % (self.call, self.status, self.url, self.bytes, phases)
+
+
+class NullRecord(object):
+    """
+    Stands in for a CallRecord when nobody is observing, so timing points
+    cost next to nothing.
+    """
+    def phase(self, name):
+        return NULL_PHASE
+
+    def add(self, name, seconds):
+        pass
+
+    def request(self, endpoint, method, url):
+        pass
+
+    def response(self, resp, content):
+        pass
+
+    def __setattr__(self, name, value):
+        # shared by all threads; nothing is recorded
+        pass
+
+
+class NullPhase(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_RECORD = NullRecord()
+NULL_PHASE = NullPhase()
+
+
+def current_record():
+    return getattr(local, 'record', NULL_RECORD)
+
+
+def instrumented(fn):
+    """
+    Decorate a LinkedInAPI method so each call is timed and reported to the
+    observers registered on the client.  Does nothing when there are none.
+    """
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        observers = self.observers
+        if not observers:
+            return fn(self, *args, **kwargs)
+        record = CallRecord(fn.__name__)
+        previous = current_record()
+        local.record = record
+        try:
+            return fn(self, *args, **kwargs)
+        except Exception, e:
+            record.error = e
+            raise
+        finally:
+            local.record = previous
+            record.duration = time.time() - record.start
+            for observer in observers:
+                observer(record)
+    return wrapper
+
+
+def timed_connect(connect, conn):
+    record = current_record()
+    start = time.time()
+    try:
+        connect(conn)
+    finally:
+        elapsed = time.time() - start
+        # connecting happens inside the transfer phase; book it separately
+        record.add('connect', elapsed)
+        record.add('transfer', -elapsed)
+
+
+class TimedHTTPConnection(httplib2.HTTPConnectionWithTimeout):
+    def connect(self):
+        timed_connect(httplib2.HTTPConnectionWithTimeout.connect, self)
+
+
+class TimedHTTPSConnection(httplib2.HTTPSConnectionWithTimeout):
+    def connect(self):
+        timed_connect(httplib2.HTTPSConnectionWithTimeout.connect, self)
+
+
+def connection_type(url):
+    return TimedHTTPSConnection if url.startswith('https') else TimedHTTPConnection
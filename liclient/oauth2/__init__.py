@@ -35,6 +35,11 @@ try:
 except ImportError:
     from cgi import parse_qs, parse_qsl
 
+try:
+    from hashlib import sha1 as sha
+except ImportError:
+    import sha # Deprecated
+
 
 VERSION = '1.0' # Hi Blaine!
 HTTP_METHOD = 'GET'
@@ -68,6 +73,22 @@ def escape(s):
     return urllib.quote(s, safe='~')
 
 
+def escape_parameter(s):
+    """Escape a parameter name or value as urllib.urlencode() does, but with
+spaces as "%20" rather than "+"."""
+    if isinstance(s, unicode):
+        s = s.encode('utf-8')
+    elif not isinstance(s, str):
+        s = str(s)
+    if s.translate(None, UNRESERVED):
+        return urllib.quote(s, safe='')
+    return s
+
+
+# characters urllib.quote() leaves as they are
+UNRESERVED = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-'
+
+
 def generate_timestamp():
     """Get seconds since epoch (UTC)."""
     return int(time.time())
@@ -266,8 +287,10 @@ those resources.
 
             # Normalized URL excludes params, query, and fragment.
             self.normalized_url = urlparse.urlunparse((scheme, netloc, path, None, None, None))
+            self.url_query = query
         else:
             self.normalized_url = None
+            self.url_query = ''
             self.__dict__['url'] = None
 
     @setter
@@ -304,14 +327,15 @@ those resources.
         return urllib.urlencode(self, True)
 
     def to_url(self):
-        """Serialize as a URL for a GET request."""
-        base_url = urlparse.urlparse(self.url)
-        query = parse_qs(base_url.query)
-        for k, v in self.items():
-            query.setdefault(k, []).append(v)
-        url = (base_url.scheme, base_url.netloc, base_url.path, base_url.params,
-               urllib.urlencode(query, True), base_url.fragment)
-        return urlparse.urlunparse(url)
+        """Serialize as a URL for a GET request.  The parameters are added
+to the query the URL already has, which is kept as it is."""
+        url, hash, fragment = self.url.partition('#')
+        query = urllib.urlencode(self.items(), True)
+        if self.url_query:
+            url += '&' + query
+        else:
+            url = url.rstrip('?') + '?' + query
+        return url + hash + fragment
 
     def get_parameter(self, parameter):
         ret = self.get(parameter)
@@ -334,18 +358,28 @@ those resources.
                 items.append((key, value))
 
         # Include any query string parameters from the provided URL
-        query = urlparse.urlparse(self.url)[4]
-        items.extend(self._split_url_string(query).items())
+        if self.url_query:
+            for key, value in self._split_url_string(self.url_query).iteritems():
+                if isinstance(value, list):
+                    items.extend((key, item) for item in value)
+                else:
+                    items.append((key, value))
 
-        encoded_str = urllib.urlencode(sorted(items))
         # Encode signature parameters per Oauth Core 1.0 protocol
         # spec draft 7, section 3.6
         # (http://tools.ietf.org/html/draft-hammer-oauth-07#section-3.6)
         # Spaces must be encoded with "%20" instead of "+"
-        return encoded_str.replace('+', '%20')
+        items.sort()
+        return '&'.join([escape_parameter(k) + '=' + escape_parameter(v) for k, v in items])
 
     def sign_request(self, signature_method, consumer, token):
         """Set the signature parameter to the result of sign."""
+        self.set_signature_parameters(signature_method, consumer, token)
+        self['oauth_signature'] = signature_method.sign(self, consumer, token)
+
+    def set_signature_parameters(self, signature_method, consumer, token):
+        """Set the parameters the signature covers besides the request's
+own: consumer key, token and signature method."""
 
         if 'oauth_consumer_key' not in self:
             self['oauth_consumer_key'] = consumer.key
@@ -354,7 +388,6 @@ those resources.
             self['oauth_token'] = token.key
 
         self['oauth_signature_method'] = signature_method.name
-        self['oauth_signature'] = signature_method.sign(self, consumer, token)
 
     @classmethod
     def make_timestamp(cls):
@@ -458,10 +491,15 @@ those resources.
 
     @staticmethod
     def _split_url_string(param_str):
-        """Turn URL string into parameters."""
+        """Turn URL string into parameters.  A parameter given more than
+once (type=STAT&type=CONN) keeps all its values, in a list, so they are
+all signed."""
         parameters = parse_qs(param_str, keep_blank_values=False)
         for k, v in parameters.iteritems():
-            parameters[k] = urllib.unquote(v[0])
+            if len(v) > 1:
+                parameters[k] = [urllib.unquote(i) for i in v]
+            else:
+                parameters[k] = urllib.unquote(v[0])
         return parameters
 
 
@@ -586,10 +624,38 @@ class Client(httplib2.Http):
 
     def request(self, uri, method="GET", body=None, headers=None,
         redirections=httplib2.DEFAULT_MAX_REDIRECTS, connection_type=None):
+        uri, body, headers = self.sign(uri, method, body, headers)
+
+        return httplib2.Http.request(self, uri, method=method, body=body,
+            headers=headers, redirections=redirections,
+            connection_type=connection_type)
+
+    def sign(self, uri, method="GET", body=None, headers=None):
+        """Sign a request, returning the uri, body and headers to send."""
+        return self.sign_many([(uri, method, body, headers)])[0]
+
+    def sign_many(self, requests):
+        """Sign many requests at once.  "requests" are (uri, method, body,
+headers) tuples; the (uri, body, headers) to send for each are returned,
+in order.  The signing key is looked up once for the whole batch."""
+        prepared = [self._prepare_request(*r) for r in requests]
+        reqs = [p[0] for p in prepared]
+        for req in reqs:
+            req.set_signature_parameters(self.method, self.consumer, self.token)
+        signatures = self.method.sign_many(reqs, self.consumer, self.token)
+        signed = []
+        for (req, uri, method, body, headers, is_multipart), signature in zip(prepared, signatures):
+            req['oauth_signature'] = signature
+            signed.append(self._signed_request(req, uri, method, body, headers, is_multipart))
+        return signed
+
+    def _prepare_request(self, uri, method="GET", body=None, headers=None):
         DEFAULT_CONTENT_TYPE = 'application/x-www-form-urlencoded'
 
         if not isinstance(headers, dict):
             headers = {}
+        else:
+            headers = dict(headers)
 
         is_multipart = method == 'POST' and headers.get('Content-Type', DEFAULT_CONTENT_TYPE) != DEFAULT_CONTENT_TYPE
 
@@ -600,9 +666,10 @@ class Client(httplib2.Http):
 
         req = Request.from_consumer_and_token(self.consumer, token=self.token,
             http_method=method, http_url=uri, parameters=parameters)
+        return req, uri, method, body, headers, is_multipart
 
-        req.sign_request(self.method, self.consumer, self.token)
-
+    def _signed_request(self, req, uri, method, body, headers, is_multipart):
+        DEFAULT_CONTENT_TYPE = 'application/x-www-form-urlencoded'
 
         if method == "POST":
             headers['Content-Type'] = headers.get('Content-Type', DEFAULT_CONTENT_TYPE)
@@ -615,9 +682,7 @@ class Client(httplib2.Http):
         else:
             headers.update(req.to_header())
 
-        return httplib2.Http.request(self, uri, method=method, body=body,
-            headers=headers, redirections=redirections,
-            connection_type=connection_type)
+        return uri, body, headers
 
 
 class SignatureMethod(object):
@@ -648,6 +713,11 @@ message to sign. Otherwise it may be less useful for debugging.
 """
         raise NotImplementedError
 
+    def sign_many(self, requests, consumer, token):
+        """Returns the signatures of many requests made with the same
+consumer and token."""
+        return [self.sign(request, consumer, token) for request in requests]
+
     def check(self, request, consumer, token, signature):
         """Returns whether the given signature is the correct signature for
 the given consumer and token signing the given request."""
@@ -658,35 +728,58 @@ the given consumer and token signing the given request."""
 class SignatureMethod_HMAC_SHA1(SignatureMethod):
     name = 'HMAC-SHA1'
 
+    # (consumer secret, token secret) -> HMAC object keyed with them, shared
+    # by every instance and copied for each signature rather than keyed
+    # again.  Emptied once it holds max_keys pairs.
+    keyed = {}
+    max_keys = 1024
+
     def signing_base(self, request, consumer, token):
+        return self.signing_key(consumer, token), self.base_string(request)
+
+    def signing_key(self, consumer, token):
+        key = '%s&' % escape(consumer.secret)
+        if token:
+            key += escape(token.secret)
+        return key
+
+    def base_string(self, request):
         sig = (
             escape(request.method),
             escape(request.normalized_url),
             escape(request.get_normalized_parameters()),
         )
-
-        key = '%s&' % escape(consumer.secret)
-        if token:
-            key += escape(token.secret)
-        raw = '&'.join(sig)
-        return key, raw
+        return '&'.join(sig)
+
+    def keyed_hmac(self, consumer, token):
+        """A fresh HMAC object keyed for the consumer and token."""
+        secrets = (consumer.secret, token.secret if token else None)
+        keyed = self.keyed.get(secrets)
+        if keyed is None:
+            # key needs to be an instance of str(), not unicode()
+            keyed = hmac.new(self.signing_key(consumer, token).encode('utf-8'), digestmod=sha)
+            if len(self.keyed) >= self.max_keys:
+                self.keyed.clear()
+            self.keyed[secrets] = keyed
+        return keyed.copy()
 
     def sign(self, request, consumer, token):
         """Builds the base signature string."""
-        key, raw = self.signing_base(request, consumer, token)
-
-        # HMAC object.
-        try:
-            from hashlib import sha1 as sha
-        except ImportError:
-            import sha # Deprecated
-
-        # key needs to be an instance of str(), not unicode()
-        hashed = hmac.new(key.encode('utf-8'), raw, sha)
+        hashed = self.keyed_hmac(consumer, token)
+        hashed.update(self.base_string(request))
 
         # Calculate the digest base 64.
         return binascii.b2a_base64(hashed.digest())[:-1]
 
+    def sign_many(self, requests, consumer, token):
+        keyed = self.keyed_hmac(consumer, token)
+        signatures = []
+        for request in requests:
+            hashed = keyed.copy()
+            hashed.update(self.base_string(request))
+            signatures.append(binascii.b2a_base64(hashed.digest())[:-1])
+        return signatures
+
 class SignatureMethod_PLAINTEXT(SignatureMethod):
 
     name = 'PLAINTEXT'
@@ -1,4 +1,31 @@
 #! usr/bin/env python
+import datetime
+
+TIMESTAMP_FORMAT = '%m/%d/%Y %I:%M:%S'
+
+class Timestamp(long):
+    """
+    A LinkedIn timestamp, i.e. milliseconds since the epoch.  It compares and
+    sorts as a number; format() renders it as a date string when needed.
+    """
+    @property
+    def datetime(self):
+        return datetime.datetime.fromtimestamp(self / 1000.0)
+
+    def format(self, fmt=TIMESTAMP_FORMAT):
+        return self.datetime.strftime(fmt)
+
+def to_timestamp(text):
+    try:
+        return Timestamp(text)
+    except (TypeError, ValueError):
+        return text
+
+def format_timestamp(value, fmt=TIMESTAMP_FORMAT):
+    if isinstance(value, Timestamp):
+        return value.format(fmt)
+    return value
+
 
 def create_json(objs):
     assert type(objs) == type(dict()), 'Passed object must be a dict with keys "results" and "total"'
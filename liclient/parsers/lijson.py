@@ -0,0 +1,301 @@
+#! usr/bin/env python
+import json
+import re
+import helpers
+import mappers
+import records
+import updates
+
+
+class LinkedInJSONParser(object):
+    """
+    Builds the mapper objects LinkedInXMLParser builds for an XML response
+    straight from the JSON one (format=json), without going through lxml.
+    JSON documents have no root tag, so "root" names the one the XML
+    document would have: 'network', 'update-comments' or 'people-search'.
+    Error responses are recognised whatever "root" is.  "content" is the
+    response body or the already decoded document.
+
+    Fields are looked up with the same paths as in XML, the tags turned
+    into JSON keys ('site-standard-profile-request/url' is read from
+    siteStandardProfileRequest.url), and values are converted to the text
+    lxml would give, so the objects compare equal to the XML ones.  They
+    have no xml, so xmlify() is not available on them.  With "compact",
+    results are converted to the slots-based types in records.py.
+    """
+    def __init__(self, content, root, compact=False):
+        self.compact = compact
+        # the number of people matching a search, as in LinkedInXMLParser
+        self.total = None
+        self.routing = {
+            'network': self.__parse_network_updates,
+            'update-comments': self.__parse_update_comments,
+            'people-search': self.__parse_people_search,
+            'error': self.__parse_error,
+        }
+        self.data = json.loads(content) if isinstance(content, basestring) else content
+        if isinstance(self.data, dict) and 'errorCode' in self.data:
+            root = 'error'
+        self.root = root
+        self.results = self.routing[root](self.data)
+        if compact:
+            self.results = records.compact(self.results, False)
+
+    def __parse_network_updates(self, data):
+        # the updates are either the document itself or under "updates"
+        collection = data.get('updates', data)
+        objs = []
+        for u in values(collection):
+            obj = build_update(u)
+            if self.compact:
+                obj = records.compact(obj, False)
+                obj.update_type = text(u.get('updateType'))
+            objs.append(obj)
+        return {'total': text(collection.get('_total', len(objs))), 'results': objs}
+
+    def __parse_update_comments(self, data):
+        return [build_comment(c) for c in values(data)]
+
+    def __parse_people_search(self, data):
+        people = data.get('people')
+        total = data.get('numResults')
+        if total is None and isinstance(people, dict):
+            total = people.get('_total')
+        self.total = int(total) if total is not None else None
+        # one list per person, as LinkedInProfileParser returns in XML
+        return [[build_profile(p)] for p in values(people)]
+
+    def __parse_error(self, data):
+        return mappers.LinkedInError(read(data, ERROR_FIELDS), None)
+
+
+# (JSON key, snake_case key) conversions, filled in as keys are seen
+SNAKE_CASE = {}
+
+
+def json_keys(path):
+    """
+    The JSON keys an XML tag path is read from:
+    'update-content/person/first-name' -> ('updateContent', 'person', 'firstName').
+    """
+    return tuple(re.sub(r'-(\w)', lambda m: m.group(1).upper(), tag) for tag in path.split('/'))
+
+
+def compile_fields(fields):
+    """
+    Compile a table of fields, in the format of updates.UpdateDecoder, to
+    (name, JSON keys, convert) triples.
+    """
+    compiled = []
+    for name, spec in fields.items():
+        path, convert = spec if isinstance(spec, tuple) else (spec, None)
+        compiled.append((name, json_keys(path), convert))
+    return compiled
+
+
+def lookup(value, keys):
+    for key in keys:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def text(value):
+    """
+    A JSON value as the text of the equivalent XML element: str when it is
+    plain ASCII and unicode otherwise, as lxml does, booleans as 'true' and
+    'false', and None for objects and arrays.
+    """
+    kind = type(value)
+    if kind is unicode:
+        try:
+            return value.encode('ascii')
+        except UnicodeEncodeError:
+            return value
+    if value is None or kind is dict or kind is list:
+        return None
+    if kind is bool:
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def values(collection):
+    """
+    The items of a JSON collection ({"_total": n, "values": [...]}).
+    """
+    if not isinstance(collection, dict):
+        return []
+    return collection.get('values') or []
+
+
+def read(value, fields):
+    """
+    Read compiled "fields" from a JSON object.  Fields that are missing or
+    empty are left out, as in UpdateDecoder.
+    """
+    data = {}
+    for name, keys, convert in fields:
+        found = value
+        for key in keys:
+            if type(found) is not dict:
+                found = None
+                break
+            found = found.get(key)
+        t = text(found)
+        if t:
+            data[name] = convert(t) if convert else t
+    return data
+
+
+def scalars(value):
+    """
+    Every plain value of a JSON object under its XML name, as the parsers
+    that read all the children of an element do.
+    """
+    data = {}
+    for key, v in value.iteritems():
+        if isinstance(v, (dict, list)):
+            continue
+        name = SNAKE_CASE.get(key)
+        if name is None:
+            name = SNAKE_CASE[key] = str(re.sub(r'([A-Z])', r'_\1', key).lower())
+        data[name] = text(v)
+    return data
+
+
+def build_profile(value):
+    data = scalars(value)
+    data.update(read(value, PROFILE_FIELDS))
+    data.setdefault('profile_url', '')
+    for name, key, mapper, fields in PROFILE_COLLECTIONS:
+        items = []
+        for item in values(value.get(key)):
+            item_data = scalars(item)
+            item_data.update(read(item, fields))
+            items.append(mapper(item_data, None))
+        data[name] = items
+    return mappers.Profile(data, None)
+
+
+def build_comment(value):
+    data = {'first_name': None, 'last_name': None, 'profile_url': '', 'timestamp': None}
+    data.update(read(value, COMMENT_FIELDS))
+    return mappers.NetworkUpdateComment(None, data)
+
+
+def build_update(value):
+    decoder = updates.decoder_for(text(value.get('updateType')))
+    compiled = UPDATE_FIELDS.get(decoder)
+    if compiled is None:
+        extras = [extra for mapper, extra in UPDATE_EXTRAS if issubclass(decoder.mapper, mapper)]
+        compiled = UPDATE_FIELDS[decoder] = (compile_fields(decoder.fields), extras[:1])
+    fields, extras = compiled
+    data = read(value, fields)
+    for extra in extras:
+        data.update(extra(value))
+    return decoder.mapper(data, None)
+
+
+# what the mappers read from the XML themselves, keyed by the first class
+# in UPDATE_EXTRAS that the update's mapper is a subclass of
+def status_extra(value):
+    return {'comments': [build_comment(c) for c in values(value.get('updateComments'))]}
+
+
+def connection_extra(value):
+    return {'targets': [build_profile(p) for p in values(lookup(value, CONNECTIONS))]}
+
+
+def new_connection_extra(value):
+    person = lookup(value, PERSON)
+    return {'targets': [build_profile(person)] if person else []}
+
+
+def group_extra(value):
+    targets = []
+    for g in values(lookup(value, GROUPS)):
+        g = read(g, GROUP_FIELDS)
+        targets.append({g.get('name'): g.get('url')})
+    return {'targets': targets}
+
+
+def answer_extra(value):
+    # the last answer's author, as NetworkAnswerUpdate.get_answers()
+    data = {}
+    for a in values(lookup(value, ANSWERS)):
+        data.update(read(a, ANSWER_FIELDS))
+    return data
+
+
+def job_posting_extra(value):
+    return {'poster': build_profile(lookup(value, JOB_POSTER) or {})}
+
+
+PERSON = json_keys('update-content/person')
+CONNECTIONS = json_keys('update-content/person/connections')
+GROUPS = json_keys('update-content/person/member-groups')
+ANSWERS = json_keys('update-content/question/answers')
+JOB_POSTER = json_keys('update-content/job/job-poster')
+
+UPDATE_EXTRAS = [
+    (mappers.NetworkStatusUpdate, status_extra),
+    (mappers.NetworkNewConnectionUpdate, new_connection_extra),
+    (mappers.NetworkConnectionUpdate, connection_extra),
+    (mappers.NetworkGroupUpdate, group_extra),
+    (mappers.NetworkAnswerUpdate, answer_extra),
+    (mappers.NetworkJobPostingUpdate, job_posting_extra),
+]
+
+# updates.UpdateDecoder -> its compiled fields and extra, if any
+UPDATE_FIELDS = {}
+
+PROFILE_FIELDS = compile_fields({
+    'profile_url': 'site-standard-profile-request/url',
+    'location': 'location/name',
+    'country': 'location/country/code',
+})
+
+# attribute, JSON key, mapper, fields besides the plain values
+PROFILE_COLLECTIONS = [
+    ('positions', 'positions', mappers.Position, compile_fields({
+        'start_date_year': 'start-date/year',
+        'start_date_month': 'start-date/month',
+        'end_date_year': 'end-date/year',
+        'end_date_month': 'end-date/month',
+        'company_id': 'company/id',
+        'company': 'company/name',
+    })),
+    ('educations', 'educations', mappers.Education, compile_fields({
+        'start_date': 'start-date/year',
+        'end_date': 'end-date/year',
+    })),
+    ('skills', 'skills', mappers.Skills, compile_fields({
+        'skill': 'skill/name',
+    })),
+    ('twitter_accounts', 'twitterAccounts', mappers.TwitterAccount, []),
+    ('member_url_resources', 'memberUrlResources', mappers.MemberUrlResource, []),
+]
+
+COMMENT_FIELDS = compile_fields({
+    'first_name': 'person/first-name',
+    'last_name': 'person/last-name',
+    'profile_url': 'person/site-standard-profile-request/url',
+    'update_content': 'comment',
+    'timestamp': ('timestamp', helpers.to_timestamp),
+})
+
+GROUP_FIELDS = compile_fields({'name': 'name', 'url': 'site-group-request/url'})
+
+ANSWER_FIELDS = compile_fields({
+    'profile_url': 'web-url',
+    'first_name': 'author/first-name',
+    'last_name': 'author/last-name',
+})
+
+ERROR_FIELDS = compile_fields({
+    'status': 'status',
+    'timestamp': 'timestamp',
+    'error_code': 'error-code',
+    'message': 'message',
+})
@@ -1,9 +1,19 @@
+from io import BytesIO
 from lxml import etree
 import mappers
+import records
+import updates
 import re
+from xpaths import XPATHS
 
 class LinkedInXMLParser(object):
-    def __init__(self, content):
+    def __init__(self, content, lazy=False, compact=False, keep_xml=True):
+        # with "lazy", profiles are built as mappers.LazyProfile; with
+        # "compact", results are converted to the slots-based types in
+        # records.py; without "keep_xml", they drop their lxml elements
+        self.lazy = lazy
+        # the number of people matching a search, of which results is a page
+        self.total = None
         self.routing = {
             'network': self.__parse_network_updates,
             'person': self.__parse_personal_profile,
@@ -15,12 +25,17 @@ class LinkedInXMLParser(object):
             'skill': self.__parse_skills,
             'education': self.__parse_education,
             'people': self.__parse_people_collection,
+            'people-search': self.__parse_people_collection,
             'twitter-account': self.__parse_twitter_accounts,
             'member-url': self.__parse_member_url_resources
         }
-        self.tree = etree.fromstring(content)
+        self.tree = content if etree.iselement(content) else etree.fromstring(content)
         self.root = self.tree.tag
         self.results = self.__forward_tree(self.tree, self.root)
+        if compact:
+            self.results = records.compact(self.results, keep_xml)
+        elif not keep_xml:
+            records.detach(self.results)
     
     def __forward_tree(self, tree, root):
         results = self.routing[root](tree)
@@ -31,7 +46,7 @@ class LinkedInXMLParser(object):
         return content
     
     def __parse_personal_profile(self, tree):
-        content = LinkedInProfileParser(tree).results
+        content = LinkedInProfileParser(tree, standalone=True, lazy=self.lazy).results
         return content
     
     def __parse_update_comments(self, tree):
@@ -39,7 +54,7 @@ class LinkedInXMLParser(object):
         return content
     
     def __parse_connections(self, tree):
-        content = LinkedInConnectionsParser(tree).results
+        content = LinkedInConnectionsParser(tree, lazy=self.lazy).results
         return content
         
     def __parse_skills(self, tree):
@@ -68,148 +83,64 @@ class LinkedInXMLParser(object):
     
     def __parse_people_collection(self, tree):
         ppl, n = tree.getchildren()
-        result_count = int(n.text)
+        self.total = int(n.text)
         content = []
         for p in ppl:
-            rslts = LinkedInProfileParser(p).results
+            rslts = LinkedInProfileParser(p, lazy=self.lazy).results
             content.append(rslts)
         return content
         
 class LinkedInNetworkUpdateParser(LinkedInXMLParser):
+    xpath_collection = XPATHS.collection({
+        'updates': 'updates',
+        'update': 'updates/update',
+    })
+
     def __init__(self, content):
-        self.xpath_collection = {
-            'first-name': etree.XPath('update-content/person/first-name'),
-            'profile-url': etree.XPath('update-content/person/site-standard-profile-request/url'),
-            'last-name': etree.XPath('update-content/person/last-name'),
-            'timestamp': etree.XPath('timestamp'),
-            'updates': etree.XPath('updates'),
-            'update': etree.XPath('updates/update'),
-            'update-type': etree.XPath('update-type'),
-            'update-key': etree.XPath('update-key'),
-            #special paths for question/answer updates
-            'qa-first-name': etree.XPath('update-content/question/author/first-name'), 
-            'qa-last-name': etree.XPath('update-content/question/author/last-name'),   
-            'qa-profile-url': etree.XPath('update-content/question/web-url'),
-            'jobp-title': etree.XPath('update-content/job/position/title'),
-            'jobp-company': etree.XPath('update-content/job/company/name'),
-            'jobp-url': etree.XPath('update-content/job/site-job-request/url')
-        }
         self.tree = content
         total = self.xpath_collection['updates'](self.tree)[0].attrib['total']
         self.results = self.__build_data(self.tree, total)
     
     def __build_data(self, tree, total):
+        # each update type is decoded as declared in updates.UPDATE_DECODERS
         results = {}
         objs = []
         results['total'] = total
-        updates = self.xpath_collection['update'](tree)
-        for u in updates:
-            types = self.xpath_collection['update-type'](u)[0].text
-            if types == 'QSTN' or types == 'ANSW':
-                data = self.__qa_data_builder(u)
-            elif types == 'JOBP':
-                data = self.__jobp_data_builder(u)
-            else:
-                data = self.__generic_data_builder(u)
-            obj = self.__objectify(data, types, u)
-            objs.append(obj)
+        for u in self.xpath_collection['update'](tree):
+            objs.append(updates.decoder_for(u.findtext('update-type')).decode(u))
         results['results'] = objs
         return results
     
-    def __generic_data_builder(self, u):
-        data = {}
-        try:
-            data['update_key'] = self.xpath_collection['update-key'](u)[0].text.strip()
-        except IndexError:
-            pass
-        data['first_name'] = self.xpath_collection['first-name'](u)[0].text.strip()
-        data['profile_url'] = self.xpath_collection['profile-url'](u)[0].text.strip()
-        data['last_name'] = self.xpath_collection['last-name'](u)[0].text.strip()
-        data['timestamp'] = self.xpath_collection['timestamp'](u)[0].text.strip()
-        return data
-        
-    def __qa_data_builder(self, u):
-        data = {}
-        data['first_name'] = self.xpath_collection['qa-first-name'](u)[0].text.strip()
-        try:
-            data['profile_url'] = self.xpath_collection['qa-profile-url'](u)[0].text.strip()
-        except IndexError: #the answers url is in a different spot, that's handled by the object
-            pass
-        data['last_name'] = self.xpath_collection['qa-last-name'](u)[0].text.strip()
-        data['timestamp'] = self.xpath_collection['timestamp'](u)[0].text.strip()
-        return data
-    
-    def __jobp_data_builder(self, u):
-        data = {}
-        data['job_title'] = self.xpath_collection['jobp-title'](u)[0].text.strip()
-        data['job_company'] = self.xpath_collection['jobp-company'](u)[0].text.strip()
-        data['profile_url'] = self.xpath_collection['jobp-url'](u)[0].text.strip()
-        return data
-    
-    def __objectify(self, data, u_type, u):
-        if u_type == 'STAT':
-            obj = mappers.NetworkStatusUpdate(data, u)
-        elif u_type == 'CONN':
-            obj = mappers.NetworkConnectionUpdate(data, u)
-        elif u_type == 'JGRP':
-            obj = mappers.NetworkGroupUpdate(data, u)
-        elif u_type == 'NCON':
-            obj = mappers.NetworkNewConnectionUpdate(data, u)
-        elif u_type == 'CCEM':
-            obj = mappers.NetworkAddressBookUpdate(data, u)
-        elif u_type == 'QSTN':
-            obj = mappers.NetworkQuestionUpdate(data, u)
-        elif u_type == 'ANSW':
-            obj = mappers.NetworkAnswerUpdate(data, u)
-        elif u_type == 'JOBP':
-            obj = mappers.NetworkJobPostingUpdate(data, u)
-        else:
-            obj = mappers.NetworkUpdate(data, u)
-        return obj
-    
 class LinkedInProfileParser(LinkedInXMLParser):
-    def __init__(self, content):
+    # tag -> attribute name, shared by every parser
+    attribute_names = {}
+
+    def __init__(self, content, standalone=False, lazy=False):
+        # a standalone <person> element is read as if it were the root of its
+        # own document, so subtrees parse the same as their serialized form
         self.tree = content
+        self.standalone = standalone
+        self.profile_class = mappers.LazyProfile if lazy else mappers.Profile
         self.results = self.__build_data(self.tree)
     
     def __build_data(self, tree):
         results = []
-        for p in tree.xpath('/person'):
+        if self.standalone and tree.tag == 'person':
+            people = [tree]
+        else:
+            people = XPATHS['/person'](tree)
+        for p in people:
             person = {}
             for item in p.getchildren():
                 if item.tag == 'location':
                     person['location'] = item.getchildren()[0].text
                 else:
                     person[re.sub(r'-', '_', item.tag)] = item.text
-            obj = mappers.Profile(person, p)
+            obj = self.profile_class(person, p)
             results.append(obj)
         
-        # deal with hierarchical results in a somewhat kludgy way
-        def fix(s):
-            return re.sub(r'-', '_', s)
-        def build_name(parent, item):
-            s = ''
-            p = item.getparent()
-            while p != parent:
-                s = fix(p.tag) + '_' + s
-                p = p.getparent()
-            s += fix(item.tag)
-            return s
         if not results:
-            person = {}
-            for item in tree.iterdescendants():
-                clean = item.text and item.text.strip()
-                if clean:
-                    name = build_name(tree, item)
-                    if name in person:
-                        value = person[name]
-                        if type(value) != list:
-                            person[name] = [value, clean]
-                        else:
-                            person[name].append(clean)
-                    else:
-                        person[name] = clean
-            obj = mappers.Profile(person, tree)
+            obj = self.profile_class(self.__flatten(tree), tree)
             results.append(obj)
         if False: #not results: # the original, elegant but wrong way
             person = {}
@@ -218,11 +149,45 @@ class LinkedInProfileParser(LinkedInXMLParser):
             obj = mappers.Profile(person, tree)
             results.append(obj)
         return results
+
+    def __flatten(self, tree):
+        # deal with hierarchical results in a somewhat kludgy way: every
+        # descendant with text is keyed by the tags on its path below "tree",
+        # e.g. positions_position_title, and repeated keys collect a list.
+        # Walked depth-first with a stack of (children, key prefix), so each
+        # element is visited once and its key built from its parent's.
+        person = {}
+        names = self.attribute_names
+        stack = [(tree.iterchildren(tag=etree.Element), '')]
+        while stack:
+            children, prefix = stack[-1]
+            item = next(children, None)
+            if item is None:
+                stack.pop()
+                continue
+            name = names.get(item.tag)
+            if name is None:
+                name = names[item.tag] = re.sub(r'-', '_', item.tag)
+            name = prefix + name
+            clean = item.text and item.text.strip()
+            if clean:
+                if name in person:
+                    value = person[name]
+                    if type(value) != list:
+                        person[name] = [value, clean]
+                    else:
+                        value.append(clean)
+                else:
+                    person[name] = clean
+            if len(item):
+                stack.append((item.iterchildren(tag=etree.Element), name + '_'))
+        return person
     
 class LinkedInNetworkCommentParser(LinkedInXMLParser):
+    comment_xpath = XPATHS['update-comment']
+
     def __init__(self, content):
         self.tree = content
-        self.comment_xpath = etree.XPath('update-comment')
         self.results = self.__build_data(self.tree)
     
     def __build_data(self, tree):
@@ -236,8 +201,9 @@ class LinkedInNetworkCommentParser(LinkedInXMLParser):
             return objs
         
 class LinkedInConnectionsParser(LinkedInXMLParser):
-    def __init__(self, content):
+    def __init__(self, content, lazy=False):
         self.tree = content
+        self.lazy = lazy
         self.total = content.attrib['total']
         self.results = self.__build_data(self.tree)
     
@@ -245,20 +211,98 @@ class LinkedInConnectionsParser(LinkedInXMLParser):
         results = {}
         results['results'] = []
         for p in tree.getchildren():
-            parsed = LinkedInXMLParser(etree.tostring(p)).results[0]
+            parsed = LinkedInXMLParser(p, lazy=self.lazy).results[0]
             results['results'].append(parsed)
         results['total'] = self.total
         return results
     
+class LinkedInProfileStreamParser(LinkedInXMLParser):
+    """
+    Incrementally parses a <connections>, <people> or <people-search>
+    document with iterparse, yielding one Profile at a time when iterated.
+    Each <person> element is detached from the document once its Profile is
+    built, so the parser itself never holds more than the record being read.
+    "content" is either the response body or a file-like object to read it
+    from.  "total" is read from the collection before the first record.
+    "lazy", "compact" and "keep_xml" are as for LinkedInXMLParser.
+
+    Parsing starts when "total" is read or iteration begins, and must carry
+    on in that same thread: lxml parsers can't move between threads.
+    """
+    # depth of the <person> records below the document root
+    record_depths = {'connections': 2, 'people': 2, 'people-search': 3}
+
+    def __init__(self, content, lazy=False, compact=False, keep_xml=True):
+        self.source = BytesIO(content) if isinstance(content, basestring) else content
+        self.lazy = lazy
+        self.compact = compact
+        self.keep_xml = keep_xml
+        self.events = None
+        self.depth = 0
+        self.root = None
+        self.__total = None
+
+    @property
+    def total(self):
+        self.__start()
+        return self.__total
+
+    def __start(self):
+        if self.events is None:
+            self.events = etree.iterparse(self.source, events=('start', 'end'))
+            self.__read_header()
+
+    def __read_header(self):
+        for event, elem in self.events:
+            if event == 'end':
+                self.depth -= 1
+                continue
+            self.depth += 1
+            if self.depth == 1:
+                self.root = elem.tag
+                if self.root not in self.record_depths:
+                    raise ValueError('Not a profile collection: <%s>' % self.root)
+                self.__total = elem.get('total')
+                if self.root != 'people-search':
+                    return
+            elif self.depth == 2 and elem.tag == 'people':
+                self.__total = elem.get('total')
+                return
+
+    def __iter__(self):
+        self.__start()
+        record_depth = self.record_depths[self.root]
+        for event, elem in self.events:
+            if event == 'start':
+                self.depth += 1
+                continue
+            if self.depth == record_depth and elem.tag == 'person':
+                profile = self.__build_profile(elem)
+                # the Profile keeps its own element; drop it from the document
+                elem.getparent().remove(elem)
+                yield profile
+            elif self.depth == 2 and elem.tag == 'num-results' and self.__total is None:
+                self.__total = elem.text
+            self.depth -= 1
+
+    def __build_profile(self, elem):
+        if self.root == 'people-search':
+            profile = LinkedInProfileParser(elem, lazy=self.lazy).results[0]
+            if self.compact:
+                return records.compact(profile, self.keep_xml)
+            return records.detach(profile) if not self.keep_xml else profile
+        return LinkedInXMLParser(elem, self.lazy, self.compact, self.keep_xml).results[0]
+
 class LinkedInErrorParser(LinkedInXMLParser):
+    xpath_collection = XPATHS.collection({
+        'status': 'status',
+        'timestamp': 'timestamp',
+        'error-code': 'error-code',
+        'message': 'message'
+    })
+
     def __init__(self, content):
         self.tree = content
-        self.xpath_collection = {
-            'status': etree.XPath('status'),
-            'timestamp': etree.XPath('timestamp'),
-            'error-code': etree.XPath('error-code'),
-            'message': etree.XPath('message')
-        }
         self.results = self.__build_data(self.tree)
     
     def __build_data(self, tree):
@@ -271,20 +315,21 @@ class LinkedInErrorParser(LinkedInXMLParser):
         return results
     
 class LinkedInPositionParser(LinkedInXMLParser):
+    xpath_collection = XPATHS.collection({
+        'id': 'id',
+        'title': 'title',
+        'summary': 'summary',
+        'start-date-year': 'start-date/year',
+        'end-date-year': 'end-date/year',
+        'start-date-month': 'start-date/month',
+        'end-date-month': 'end-date/month',
+        'is-current': 'is-current',
+        'company-id': 'company/id',
+        'company': 'company/name'
+    })
+
     def __init__(self, content):
         self.tree = content
-        self.xpath_collection = {
-            'id': etree.XPath('id'),
-            'title': etree.XPath('title'),
-            'summary': etree.XPath('summary'),
-            'start-date-year': etree.XPath('start-date/year'),
-            'end-date-year': etree.XPath('end-date/year'),
-            'start-date-month': etree.XPath('start-date/month'),
-            'end-date-month': etree.XPath('end-date/month'),
-            'is-current': etree.XPath('is-current'),
-            'company-id': etree.XPath('company/id'),
-            'company': etree.XPath('company/name')
-        }
         self.results = self.__build_data(self.tree)
     
     def __build_data(self, tree):
@@ -295,17 +340,18 @@ class LinkedInPositionParser(LinkedInXMLParser):
         return results
 
 class LinkedInEducationParser(LinkedInXMLParser):
+    xpath_collection = XPATHS.collection({
+        'id': 'id',
+        'school-name': 'school-name',
+        'field-of-study': 'field-of-study',
+        'start-date': 'start-date/year',
+        'end-date': 'end-date/year',
+        'degree': 'degree',
+        'activities': 'activities'
+    })
+
     def __init__(self, content):
         self.tree = content
-        self.xpath_collection = {
-            'id': etree.XPath('id'),
-            'school-name': etree.XPath('school-name'),
-            'field-of-study': etree.XPath('field-of-study'),
-            'start-date': etree.XPath('start-date/year'),
-            'end-date': etree.XPath('end-date/year'),
-            'degree': etree.XPath('degree'),
-            'activities': etree.XPath('activities')
-        }
         self.results = self.__build_data(self.tree)
     
     def __build_data(self, tree):
@@ -320,12 +366,13 @@ class LinkedInEducationParser(LinkedInXMLParser):
         
         
 class LinkedInTwitterAccountParser(LinkedInXMLParser):
+    xpath_collection = XPATHS.collection({
+        'provider-account-id': 'provider-account-id',
+        'provider-account-name': 'provider-account-name',
+    })
+
     def __init__(self, content):
         self.tree = content
-        self.xpath_collection = {
-            'provider-account-id': etree.XPath('provider-account-id'),
-            'provider-account-name': etree.XPath('provider-account-name'),
-        }
         self.results = self.__build_data(self.tree)
     
     def __build_data(self, tree):
@@ -336,12 +383,13 @@ class LinkedInTwitterAccountParser(LinkedInXMLParser):
         return results
         
 class LinkedInMemberUrlResourceParser(LinkedInXMLParser):
+    xpath_collection = XPATHS.collection({
+        'url': 'url',
+        'name': 'name',
+    })
+
     def __init__(self, content):
         self.tree = content
-        self.xpath_collection = {
-            'url': etree.XPath('url'),
-            'name': etree.XPath('name'),
-        }
         self.results = self.__build_data(self.tree)
     
     def __build_data(self, tree):
@@ -355,12 +403,13 @@ class LinkedInMemberUrlResourceParser(LinkedInXMLParser):
         return results
 
 class LinkedInSkillsParser(LinkedInXMLParser):
+    xpath_collection = XPATHS.collection({
+        'id': 'id',
+        'name': 'skill/name',
+    })
+
     def __init__(self, content):
         self.tree = content
-        self.xpath_collection = {
-            'id': etree.XPath('id'),
-            'name': etree.XPath('skill/name'),
-        }
         self.results = self.__build_data(self.tree)
     
     def __build_data(self, tree):
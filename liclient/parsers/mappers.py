@@ -1,6 +1,8 @@
 from lxml import etree
 import datetime, re
+import helpers
 import lixml
+from xpaths import XPATHS
     
 class LinkedInData(object):
     def __init__(self, data, xml):
@@ -45,19 +47,24 @@ class NetworkUpdate(LinkedInData):
         jsondict = {'first_name': self.first_name,
                     'last_name': self.last_name,
                     'update_content': self.update_content,
-                    'timestamp': self.timestamp,
+                    'timestamp': helpers.format_timestamp(self.timestamp),
                     'update_key': self.update_key,
                     'profile_url': self.profile_url}
         return jsondict
     
 class NetworkStatusUpdate(NetworkUpdate):
+    status_xpath = XPATHS['update-content/person/current-status']
+    comment_xpath = XPATHS['update-comments/update-comment']
+    
     def __init__(self, data, xml):
-        self.status_xpath = etree.XPath('update-content/person/current-status')
-        self.comment_xpath = etree.XPath('update-comments/update-comment')
         self.update_key = None
         self.xml = xml
         self.parse_data(data)
-        self.update_content = self.status_xpath(xml)[0].text.strip()
+        if xml is None:
+            # decoded from JSON, comments included (see lijson)
+            return
+        if not getattr(self, 'update_content', None):
+            self.update_content = self.status_xpath(xml)[0].text.strip()
         self.comments = []
         self.get_comments()
         
@@ -68,13 +75,15 @@ class NetworkStatusUpdate(NetworkUpdate):
         return
 
 class NetworkConnectionUpdate(NetworkUpdate):
+    connection_target = XPATHS['update-content/person/connections/person']
+    
     def __init__(self, data, xml):
         self.xml = xml
         self.update_key = None
         self.parse_data(data)
-        self.connection_target = etree.XPath('update-content/person/connections/person')
-        self.targets = []
-        self.get_targets()
+        if xml is not None:
+            self.targets = []
+            self.get_targets()
         self.set_update_content(self.targets)
     
     def get_targets(self):
@@ -94,13 +103,13 @@ class NetworkConnectionUpdate(NetworkUpdate):
         return
 
 class NetworkNewConnectionUpdate(NetworkConnectionUpdate):
+    connection_target = XPATHS['update-content/person']
+    
     def get_targets(self):
-        self.connection_target = etree.XPath('update-content/person/')
         for p in self.connection_target(self.xml):
-            obj = LinkedInProfileParser(p).results
-        self.targets = obj
+            self.targets = lixml.LinkedInProfileParser(p).results
     
-    def set_update_content(self, target):
+    def set_update_content(self, targets):
         update_str = ' is now connected with you.'
         update_str = targets[0].first_name + ' ' + targets[0].last_name + update_str
         self.update_content = update_str
@@ -114,15 +123,17 @@ class NetworkAddressBookUpdate(NetworkNewConnectionUpdate):
         return
 
 class NetworkGroupUpdate(NetworkUpdate):
+    group_target = XPATHS['update-content/person/member-groups/member-group']
+    group_name_target = XPATHS['name']
+    group_url_target = XPATHS['site-group-request/url']
+    
     def __init__(self, data, xml):
         self.update_key = None
         self.xml = xml
         self.parse_data(data)
-        self.group_target = etree.XPath('update-content/person/member-groups/member-group')
-        self.group_name_target = etree.XPath('name')
-        self.group_url_target = etree.XPath('site-group-request/url')
-        self.targets = []
-        self.get_targets()
+        if xml is not None:
+            self.targets = []
+            self.get_targets()
         self.set_update_content(self.targets)
     
     def get_targets(self):
@@ -146,49 +157,63 @@ class NetworkGroupUpdate(NetworkUpdate):
         return
     
 class NetworkQuestionUpdate(NetworkUpdate):
+    question_title_xpath = XPATHS['update-content/question/title']
+    
     def __init__(self, data, xml):
         self.xml = xml
         self.update_key = None
         self.parse_data(data)
-        self.question_title_xpath = etree.XPath('update-content/question/title')
         self.set_update_content()
     
+    def get_question_title(self):
+        # decoded along with the other fields unless built straight from xml
+        if 'question_title' in self.__dict__:
+            return self.__dict__['question_title']
+        return self.question_title_xpath(self.xml)[0].text.strip()
+    
     def set_update_content(self):
         update_str = self.first_name + ' ' + self.last_name + ' asked a question: '
-        qstn_text = self.question_title_xpath(self.xml)[0].text.strip()
+        qstn_text = self.get_question_title()
         update_str += qstn_text
         self.update_content = update_str
         return
     
 class NetworkAnswerUpdate(NetworkUpdate):
+    question_title_xpath = XPATHS['update-content/question/title']
+    get_question_title = NetworkQuestionUpdate.__dict__['get_question_title']
+    answer_xpath = XPATHS['update-content/question/answers/answer']
+    
     def __init__(self, data, xml):
         self.update_key = None
         self.xml = xml
         self.parse_data(data)
-        self.question_title_xpath = etree.XPath('update-content/question/title')
-        self.answer_xpath = etree.XPath('update-content/question/answers/answer')
-        self.get_answers()
+        if xml is not None:
+            self.get_answers()
         self.set_update_content()
     
     def get_answers(self):
         for a in self.answer_xpath(self.xml):
-            self.profile_url = a.xpath('web-url')[0].text.strip()
-            self.first_name = a.xpath('author/first-name')[0].text.strip()
-            self.last_name = a.xpath('author/last-name')[0].text.strip()
+            self.profile_url = XPATHS['web-url'](a)[0].text.strip()
+            self.first_name = XPATHS['author/first-name'](a)[0].text.strip()
+            self.last_name = XPATHS['author/last-name'](a)[0].text.strip()
     
     def set_update_content(self):
         update_str = self.first_name + ' ' + self.last_name + ' answered: '
-        qstn_text = self.question_title_xpath(self.xml)[0].text.strip()
+        qstn_text = self.get_question_title()
         update_str += qstn_text
         self.update_content = update_str
         return
     
 class NetworkJobPostingUpdate(NetworkUpdate):
+    poster_xpath = XPATHS['update-content/job/job-poster']
+    
     def __init__(self, data, xml):
         self.xml = xml
+        self.update_key = None
         self.parse_data(data)
+        if xml is not None:
+            self.poster = lixml.LinkedInXMLParser(self.poster_xpath(xml)[0]).results[0]
         self.set_update_content()
-        self.poster = lixml.LinkedInXMLParser(xml.xpath('job-poster')[0])
     
     def set_update_content(self):
         update_str = self.poster.first_name + ' ' + self.poster.last_name + ' posted a job: ' + self.job_title
@@ -196,28 +221,49 @@ class NetworkJobPostingUpdate(NetworkUpdate):
         return
 
 class NetworkUpdateComment(LinkedInData):
-    def __init__(self, xml):
+    comment_xpath = XPATHS['comment']
+    person_xpath = XPATHS['person']
+    timestamp_xpath = XPATHS['timestamp']
+    
+    def __init__(self, xml, data=None):
         self.xml = xml
-        self.comment_xpath = etree.XPath('comment')
-        self.person_xpath = etree.XPath('person')
-        self.__content = lixml.LinkedInXMLParser(etree.tostring(self.person_xpath(xml)[0])).results[0]
+        if data is not None:
+            # decoded from JSON (see lijson)
+            self.parse_data(data)
+            return
+        self.__content = lixml.LinkedInXMLParser(self.person_xpath(xml)[0]).results[0]
         self.first_name = self.__content.first_name
         self.last_name = self.__content.last_name
         self.profile_url = self.__content.profile_url
         self.update_content = self.comment_xpath(xml)[0].text
+        timestamp = self.timestamp_xpath(xml)
+        self.timestamp = helpers.to_timestamp(timestamp[0].text.strip()) if timestamp else None
         
     def jsonify(self):
         jsondict = {'first_name': self.first_name,
                     'last_name': self.last_name,
                     'update_content': self.update_content,
+                    'timestamp': helpers.format_timestamp(self.timestamp),
                     'profile_url': self.profile_url}
         return jsondict
 
 class Profile(LinkedInData):
+    profile_url_xpath = XPATHS['site-standard-profile-request/url']
+    location_name_xpath = XPATHS['location/name']
+    country_code_xpath = XPATHS['location/country/code']
+    profile_position_xpath = XPATHS['positions/position']
+    profile_skills_xpath = XPATHS['skills/skill']
+    profile_education_xpath = XPATHS['educations/education']
+    twitter_accounts_xpath = XPATHS['twitter-accounts/twitter-account']
+    url_resources_xpath = XPATHS['member-url-resources/member-url']
+    
     def __init__(self, data, xml):
         self.profile_url = ''
         self.xml = xml
         self.parse_data(data)
+        if xml is None:
+            # decoded from JSON, sub-collections included (see lijson)
+            return
         self.positions = []
         self.skills = []
         self.educations = []
@@ -234,56 +280,99 @@ class Profile(LinkedInData):
         
     def set_profile_url(self):
         try:
-            profile_url_xpath = etree.XPath('site-standard-profile-request/url')
-            self.profile_url = profile_url_xpath(self.xml)[0].text.strip()
+            self.profile_url = self.profile_url_xpath(self.xml)[0].text.strip()
         except:
             pass
             
     def get_location(self):
     	try:
-            location_name_xpath = etree.XPath('location/name')
-            self.location = location_name_xpath(self.xml)[0].text.strip()
-            country_code_xpath = etree.XPath('location/country/code')
-            self.country = country_code_xpath(self.xml)[0].text.strip()
+            self.location = self.location_name_xpath(self.xml)[0].text.strip()
+            self.country = self.country_code_xpath(self.xml)[0].text.strip()
         except:
             pass
         
     def get_positions(self):
-        profile_position_xpath = etree.XPath('positions/position')
-        pos = profile_position_xpath(self.xml)
+        pos = self.profile_position_xpath(self.xml)
         for p in pos:
-            obj = lixml.LinkedInXMLParser(etree.tostring(p)).results
+            obj = lixml.LinkedInXMLParser(p).results
             self.positions.append(obj)
             
     def get_skills(self):
         
-        profile_skills_xpath = etree.XPath('skills/skill')
-        skills = profile_skills_xpath(self.xml)
+        skills = self.profile_skills_xpath(self.xml)
         for s in skills:
-            obj = lixml.LinkedInXMLParser(etree.tostring(s)).results
+            obj = lixml.LinkedInXMLParser(s).results
             self.skills.append(obj)
     
     def get_educations(self):
-        profile_education_xpath = etree.XPath('educations/education')
-        eds = profile_education_xpath(self.xml)
+        eds = self.profile_education_xpath(self.xml)
         for e in eds:
-            obj = lixml.LinkedInXMLParser(etree.tostring(e)).results
+            obj = lixml.LinkedInXMLParser(e).results
             self.educations.append(obj)
             
     def get_twitter_accounts(self):
-    	twitter_accounts_xpath = etree.XPath('twitter-accounts/twitter-account')
-    	accounts = twitter_accounts_xpath(self.xml)
+    	accounts = self.twitter_accounts_xpath(self.xml)
     	for account in accounts:
-    		obj = lixml.LinkedInXMLParser(etree.tostring(account)).results
+    		obj = lixml.LinkedInXMLParser(account).results
     		self.twitter_accounts.append(obj)
     		
     def get_member_url_resources(self):
-    	url_resources_xpath = etree.XPath('member-url-resources/member-url')
-    	urls = url_resources_xpath(self.xml)
+    	urls = self.url_resources_xpath(self.xml)
     	for url in urls:
-    		obj = lixml.LinkedInXMLParser(etree.tostring(url)).results
+    		obj = lixml.LinkedInXMLParser(url).results
     		self.member_url_resources.append(obj)
 
+class LazyProfile(Profile):
+    """
+    A Profile that only extracts its location and sub-collections (positions,
+    skills, educations, twitter accounts and member urls) from the XML the
+    first time they are read, and keeps them from then on.  Meant for
+    listings that only show a few fields of each profile.
+    """
+    collections = {'positions': 'get_positions',
+                   'skills': 'get_skills',
+                   'educations': 'get_educations',
+                   'twitter_accounts': 'get_twitter_accounts',
+                   'member_url_resources': 'get_member_url_resources'}
+
+    def __init__(self, data, xml):
+        self.profile_url = ''
+        self.xml = xml
+        self.parse_data(data)
+        self.pending = set(self.collections.keys() + ['location', 'country'])
+        for name in self.collections:
+            self.__dict__.pop(name, None)
+        # kept when the XML has no location/name, as Profile does
+        self.unread = dict((k, self.__dict__.pop(k)) for k in ('location', 'country') if k in self.__dict__)
+        if not self.profile_url:
+            self.set_profile_url()
+
+    def __getattr__(self, name):
+        pending = self.__dict__.get('pending')
+        if not pending or name not in pending:
+            raise AttributeError(name)
+        if name in self.collections:
+            pending.discard(name)
+            self.__dict__[name] = []
+            getattr(self, self.collections[name])()
+        else:
+            pending.difference_update(('location', 'country'))
+            self.__dict__.update(self.unread)
+            self.get_location()
+        return getattr(self, name)
+
+    def jsonify(self):
+        # location and country are part of the output, read them first
+        getattr(self, 'location', None)
+        return Profile.jsonify(self)
+
+    def materialize(self):
+        """
+        Extract everything still pending, e.g. before the xml is dropped.
+        """
+        for name in list(self.pending):
+            getattr(self, name, None)
+
     		
         
 class Position(LinkedInData):
@@ -0,0 +1,166 @@
+#! usr/bin/env python
+import helpers
+import mappers
+from xpaths import XPATHS
+
+
+class Record(object):
+    """
+    Base for the compact record types.  Fields are kept in __slots__ rather
+    than in a per-instance __dict__; fields a response has but the record
+    type doesn't declare go to "extra", a dict only created when needed, and
+    are still readable as attributes.  Fields missing from the response, or
+    empty in it, are None.  "xml" is the element the record was built from, or
+    None once it has been dropped.
+    """
+    __slots__ = ('xml', 'extra')
+    fields = ()
+
+    def __init__(self, data, xml=None):
+        self.xml = xml
+        self.extra = None
+        for name in self.fields:
+            setattr(self, name, data.get(name))
+        extra = dict((k, v) for k, v in data.iteritems() if v is not None and k not in self.fields)
+        if extra:
+            self.extra = extra
+
+    def __getattr__(self, name):
+        if name != 'extra' and self.extra and name in self.extra:
+            return self.extra[name]
+        raise AttributeError(name)
+
+    def items(self):
+        for name in self.fields:
+            yield name, getattr(self, name)
+        if self.extra:
+            for item in self.extra.iteritems():
+                yield item
+
+    def jsonify(self):
+        return dict((k, v) for k, v in self.items() if type(v) == type(''))
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__, getattr(self, 'id', None) or '')
+
+
+class ProfileRecord(Record):
+    fields = ('id', 'first_name', 'last_name', 'headline', 'industry', 'summary', 'location', 'country',
+              'profile_url', 'public_profile_url', 'picture_url', 'num_connections', 'positions', 'skills',
+              'educations', 'twitter_accounts', 'member_url_resources')
+    __slots__ = fields
+
+    def __str__(self):
+        return '<No Content>'
+
+
+class PositionRecord(Record):
+    fields = ('id', 'title', 'summary', 'start_date_year', 'start_date_month', 'end_date_year',
+              'end_date_month', 'is_current', 'company_id', 'company')
+    __slots__ = fields
+
+
+class EducationRecord(Record):
+    fields = ('id', 'school_name', 'field_of_study', 'start_date', 'end_date', 'degree', 'activities')
+    __slots__ = fields
+
+
+class NetworkUpdateRecord(Record):
+    fields = ('update_type', 'update_key', 'first_name', 'last_name', 'profile_url', 'timestamp',
+              'update_content', 'comments', 'targets')
+    __slots__ = fields
+
+    def jsonify(self):
+        return {'first_name': self.first_name,
+                'last_name': self.last_name,
+                'update_content': self.update_content,
+                'timestamp': helpers.format_timestamp(self.timestamp),
+                'update_key': self.update_key,
+                'profile_url': self.profile_url}
+
+    def __str__(self):
+        return self.update_content or '<No Content>'
+
+
+class NetworkUpdateCommentRecord(Record):
+    fields = ('first_name', 'last_name', 'profile_url', 'update_content', 'timestamp')
+    __slots__ = fields
+
+    def jsonify(self):
+        return {'first_name': self.first_name,
+                'last_name': self.last_name,
+                'update_content': self.update_content,
+                'timestamp': helpers.format_timestamp(self.timestamp),
+                'profile_url': self.profile_url}
+
+    def __str__(self):
+        return self.update_content or '<No Content>'
+
+
+# mapper class -> record type; subclasses are looked up through their bases
+RECORD_TYPES = [
+    (mappers.Profile, ProfileRecord),
+    (mappers.Position, PositionRecord),
+    (mappers.Education, EducationRecord),
+    (mappers.NetworkUpdate, NetworkUpdateRecord),
+    (mappers.NetworkUpdateComment, NetworkUpdateCommentRecord),
+]
+
+
+def compact(obj, keep_xml=True):
+    """
+    Convert mapper objects, and the lists and result dicts holding them, to
+    record types, recursively.  Mappers without a record type are kept but
+    lose their xml unless "keep_xml" is set.
+    """
+    if isinstance(obj, list):
+        return [compact(o, keep_xml) for o in obj]
+    if isinstance(obj, dict):
+        return dict((k, compact(v, keep_xml)) for k, v in obj.iteritems())
+    if not isinstance(obj, mappers.LinkedInData):
+        return obj
+    record_type = record_type_for(obj)
+    if record_type is None:
+        return detach(obj) if not keep_xml else obj
+    data = fields_of(obj)
+    if record_type is NetworkUpdateRecord and obj.xml is not None:
+        data['update_type'] = XPATHS['update-type'](obj.xml)[0].text
+    for name, value in data.items():
+        if isinstance(value, (list, dict, mappers.LinkedInData)):
+            data[name] = compact(value, keep_xml)
+    return record_type(data, obj.xml if keep_xml else None)
+
+
+def detach(obj):
+    """
+    Drop the xml of mapper objects, recursively, so they no longer keep
+    their lxml tree alive.  xmlify() is no longer available on them.
+    """
+    if isinstance(obj, (list, tuple)):
+        for o in obj:
+            detach(o)
+    elif isinstance(obj, dict):
+        for o in obj.itervalues():
+            detach(o)
+    elif isinstance(obj, mappers.LinkedInData):
+        if isinstance(obj, mappers.LazyProfile):
+            obj.materialize()
+        obj.xml = None
+        for value in obj.__dict__.itervalues():
+            if isinstance(value, (list, dict, mappers.LinkedInData)):
+                detach(value)
+    return obj
+
+
+def record_type_for(obj):
+    for mapper_type, record_type in RECORD_TYPES:
+        if isinstance(obj, mapper_type):
+            return record_type
+    return None
+
+
+def fields_of(obj):
+    if isinstance(obj, mappers.LazyProfile):
+        obj.materialize()
+    return dict((k, v) for k, v in obj.__dict__.iteritems()
+                if k not in ('xml', 'pending', 'unread') and not k.startswith('_'))
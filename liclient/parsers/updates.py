@@ -0,0 +1,99 @@
+#! usr/bin/env python
+import helpers
+import mappers
+
+
+class UpdateDecoder(object):
+    """
+    Decodes one type of network update.  "fields" maps the keys of the data
+    handed to "mapper" to paths of tags below <update>, e.g.
+    'update-content/person/first-name', or to (path, convert) pairs where
+    convert is applied to the text.  The paths are compiled into a tree of
+    tags, so an update is decoded in a single walk that only descends into
+    the elements the fields are under.  The first non-empty match of a path
+    is used; fields with no match are left out of the data.
+    """
+    def __init__(self, mapper, fields):
+        self.mapper = mapper
+        self.fields = fields
+        self.tags = {}
+        for name, spec in fields.items():
+            path, convert = spec if isinstance(spec, tuple) else (spec, None)
+            node = self.tags
+            steps = path.split('/')
+            for tag in steps[:-1]:
+                node = node.setdefault(tag, ({}, []))[0]
+            node.setdefault(steps[-1], ({}, []))[1].append((name, convert))
+
+    def decode(self, update):
+        data = {}
+        self.walk(update, self.tags, data)
+        return self.mapper(data, update)
+
+    def walk(self, element, tags, data):
+        for child in element:
+            match = tags.get(child.tag)
+            if match is None:
+                continue
+            children, names = match
+            if names and child.text:
+                text = child.text.strip()
+                for name, convert in names:
+                    if text and name not in data:
+                        data[name] = convert(text) if convert else text
+            if children:
+                self.walk(child, children, data)
+
+
+COMMON_FIELDS = {
+    'update_key': 'update-key',
+    'timestamp': ('timestamp', helpers.to_timestamp),
+}
+
+PERSON_FIELDS = dict(COMMON_FIELDS, **{
+    'first_name': 'update-content/person/first-name',
+    'last_name': 'update-content/person/last-name',
+    'profile_url': 'update-content/person/site-standard-profile-request/url',
+})
+
+QUESTION_FIELDS = dict(COMMON_FIELDS, **{
+    'first_name': 'update-content/question/author/first-name',
+    'last_name': 'update-content/question/author/last-name',
+    'profile_url': 'update-content/question/web-url',
+    'question_title': 'update-content/question/title',
+})
+
+JOB_FIELDS = dict(COMMON_FIELDS, **{
+    'first_name': 'update-content/job/job-poster/first-name',
+    'last_name': 'update-content/job/job-poster/last-name',
+    'job_title': 'update-content/job/position/title',
+    'job_company': 'update-content/job/company/name',
+    'profile_url': 'update-content/job/site-job-request/url',
+})
+
+# update type code -> decoder; types not listed use DEFAULT_DECODER
+UPDATE_DECODERS = {
+    'STAT': UpdateDecoder(mappers.NetworkStatusUpdate,
+                          dict(PERSON_FIELDS, update_content='update-content/person/current-status')),
+    'CONN': UpdateDecoder(mappers.NetworkConnectionUpdate, PERSON_FIELDS),
+    'JGRP': UpdateDecoder(mappers.NetworkGroupUpdate, PERSON_FIELDS),
+    'NCON': UpdateDecoder(mappers.NetworkNewConnectionUpdate, PERSON_FIELDS),
+    'CCEM': UpdateDecoder(mappers.NetworkAddressBookUpdate, PERSON_FIELDS),
+    'QSTN': UpdateDecoder(mappers.NetworkQuestionUpdate, QUESTION_FIELDS),
+    'ANSW': UpdateDecoder(mappers.NetworkAnswerUpdate, QUESTION_FIELDS),
+    'JOBP': UpdateDecoder(mappers.NetworkJobPostingUpdate, JOB_FIELDS),
+}
+
+DEFAULT_DECODER = UpdateDecoder(mappers.NetworkUpdate, PERSON_FIELDS)
+
+
+def register_update_type(code, mapper, fields=PERSON_FIELDS):
+    """
+    Decode updates of type "code" into "mapper" objects, built from the
+    fields described by "fields" (see UpdateDecoder).
+    """
+    UPDATE_DECODERS[code] = UpdateDecoder(mapper, fields)
+
+
+def decoder_for(code):
+    return UPDATE_DECODERS.get(code, DEFAULT_DECODER)
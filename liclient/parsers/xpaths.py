@@ -0,0 +1,23 @@
+#! usr/bin/env python
+from lxml import etree
+
+
+class XPathCatalog(dict):
+    """
+    Compiled XPath expressions keyed by their source text, shared by all the
+    parsers and mappers.  Each expression is compiled the first time it is
+    looked up (for the parsers and mappers, when the module is imported) and
+    reused by every object built afterwards.
+    """
+    def __missing__(self, path):
+        xpath = self[path] = etree.XPath(path)
+        return xpath
+
+    def collection(self, paths):
+        """
+        Map names to compiled expressions, as used for a parser's
+        xpath_collection.
+        """
+        return dict((name, self[path]) for name, path in paths.items())
+
+XPATHS = XPathCatalog()
@@ -0,0 +1,121 @@
+#! usr/bin/env python
+
+import threading
+import time
+from contextlib import contextmanager
+
+import oauth2 as oauth
+
+
+class ClientPool(object):
+    """
+    A thread-safe pool of oauth.Client objects.  Since oauth.Client is an
+    httplib2.Http, every pooled client keeps its keep-alive connections open
+    between calls, so repeated requests skip the TCP/TLS handshake.
+
+    Idle clients are keyed by consumer key and access token key.  When no
+    client is idle for a given token, an idle client of the same consumer is
+    re-bound to the new token instead of building a fresh one, which keeps
+    one warm connection per host no matter how many member tokens are used.
+
+    Clients are handed out exclusively (httplib2.Http is not safe to use from
+    two threads at once) and are returned to the pool when the caller is done.
+    At most "max_size" clients are kept idle; clients idle for longer than
+    "max_idle" seconds are closed and dropped.
+    """
+    def __init__(self, max_size=32, max_idle=300, timeout=None):
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.idle = []
+
+    def key(self, consumer, token=None):
+        return (consumer.key, token.key if token else None)
+
+    def acquire(self, consumer, token=None):
+        """
+        Check a client out of the pool, creating one if none is idle.  The
+        client must be handed back with release() or discard().
+        """
+        key = self.key(consumer, token)
+        with self.lock:
+            self.evict_expired()
+            client = self.pop_idle(lambda k: k == key)
+            if client is None:
+                client = self.pop_idle(lambda k: k[0] == key[0])
+        if client is None:
+            return self.create_client(consumer, token)
+        client.consumer = consumer
+        client.token = token
+        return client
+
+    def release(self, client):
+        key = self.key(client.consumer, client.token)
+        with self.lock:
+            self.idle.append((key, client, time.time()))
+            self.evict_expired()
+            while len(self.idle) > self.max_size:
+                self.close_client(self.idle.pop(0)[1])
+
+    def discard(self, client):
+        """
+        Drop a client whose connections may be in a bad state.
+        """
+        self.close_client(client)
+
+    @contextmanager
+    def client(self, consumer, token=None):
+        client = self.acquire(consumer, token)
+        try:
+            yield client
+        except:
+            self.discard(client)
+            raise
+        self.release(client)
+
+    def clear(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for key, client, stamp in idle:
+            self.close_client(client)
+
+    def create_client(self, consumer, token=None):
+        return oauth.Client(consumer, token, timeout=self.timeout)
+
+    def pop_idle(self, match):
+        # most recently released clients are at the end of the list
+        for i in xrange(len(self.idle) - 1, -1, -1):
+            if match(self.idle[i][0]):
+                return self.idle.pop(i)[1]
+        return None
+
+    def evict_expired(self):
+        cutoff = time.time() - self.max_idle
+        while self.idle and self.idle[0][2] < cutoff:
+            self.close_client(self.idle.pop(0)[1])
+
+    def close_client(self, client):
+        for conn in client.connections.values():
+            try:
+                conn.close()
+            except:
+                pass
+        client.connections.clear()
+
+    def __len__(self):
+        return len(self.idle)
+
+
+def set_timeout(client, timeout):
+    """
+    Give a pooled client a new socket timeout, applied to the connections
+    it already keeps open as well as to the ones it opens from now on.
+    """
+    if client.timeout == timeout:
+        return
+    client.timeout = timeout
+    for conn in client.connections.values():
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
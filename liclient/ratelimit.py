@@ -0,0 +1,127 @@
+#! usr/bin/env python
+
+import threading
+import time
+
+
+class TokenBucket(object):
+    """
+    Allows "rate" requests per second on average, with bursts of up to
+    "capacity" requests.  Callers reserve a slot and are told how long to
+    wait for it, so waiting callers are served in arrival order.
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.stamp = time.time()
+        self.paused_until = 0
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def reserve(self, now):
+        self.refill(now)
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        return max(wait, self.paused_until - now)
+
+    def pause(self, until):
+        self.paused_until = max(self.paused_until, until)
+
+    def is_idle(self, now):
+        self.refill(now)
+        return self.tokens >= self.capacity and self.paused_until <= now
+
+
+class RateLimiter(object):
+    """
+    Paces requests per consumer key (application quota) and per access token
+    (member quota) with token buckets.  acquire() blocks the calling thread
+    until both buckets allow another request.
+
+    When LinkedIn answers with a throttle error, the bucket it applies to is
+    paused for the Retry-After period (or "throttle_delay" seconds) and the
+    request is sent again once it is allowed, up to "max_throttle_retries"
+    times.  A throttled member only holds back that member's requests, so
+    work queued for other members keeps going in the meantime.
+    """
+    def __init__(self, consumer_rate=10, token_rate=2, consumer_burst=None, token_burst=None,
+                 throttle_delay=60, max_throttle_retries=3):
+        self.consumer_rate = consumer_rate
+        self.consumer_burst = consumer_burst
+        self.token_rate = token_rate
+        self.token_burst = token_burst
+        self.throttle_delay = throttle_delay
+        self.max_throttle_retries = max_throttle_retries
+        self.consumers = {}
+        self.tokens = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, consumer_key, token_key=None):
+        waited = 0
+        if token_key is not None:
+            while True:
+                with self.lock:
+                    now = time.time()
+                    token = self.token_bucket(token_key)
+                    # a throttled member waits without reserving anything
+                    pause = token.paused_until - now
+                    if pause <= 0:
+                        wait = token.reserve(now)
+                        break
+                time.sleep(pause)
+                waited += pause
+            # the member's own pace is waited out before an application slot
+            # is reserved, so a backlogged member neither holds back other
+            # members nor sends late on top of their share of the quota
+            if wait > 0:
+                time.sleep(wait)
+                waited += wait
+        with self.lock:
+            wait = self.consumer_bucket(consumer_key).reserve(time.time())
+        if wait > 0:
+            time.sleep(wait)
+        return waited + wait
+
+    def consumer_bucket(self, key):
+        bucket = self.consumers.get(key)
+        if bucket is None:
+            bucket = self.consumers[key] = TokenBucket(self.consumer_rate, self.consumer_burst)
+        return bucket
+
+    def token_bucket(self, key):
+        bucket = self.tokens.get(key)
+        if bucket is None:
+            if len(self.tokens) >= 10000:
+                self.prune()
+            bucket = self.tokens[key] = TokenBucket(self.token_rate, self.token_burst)
+        return bucket
+
+    def prune(self):
+        # drop the buckets of members that are back to a full allowance
+        now = time.time()
+        for key in [k for k, b in self.tokens.items() if b.is_idle(now)]:
+            del self.tokens[key]
+
+    def is_throttle(self, resp, content):
+        if resp.status == 429:
+            return True
+        return resp.status in (403, 503) and 'throttle' in (content or '').lower()
+
+    def throttled(self, consumer_key, token_key, resp, content):
+        """
+        Pause the bucket a throttle response applies to.  Returns the delay.
+        """
+        try:
+            delay = float(resp.get('retry-after'))
+        except (TypeError, ValueError):
+            delay = self.throttle_delay
+        until = time.time() + delay
+        with self.lock:
+            if token_key is None or 'application' in (content or '').lower():
+                self.consumer_bucket(consumer_key).pause(until)
+            else:
+                self.token_bucket(token_key).pause(until)
+        return delay
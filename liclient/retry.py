@@ -0,0 +1,84 @@
+#! usr/bin/env python
+
+import errno
+import httplib
+import random
+import socket
+import threading
+
+import httplib2
+
+# errors raised by httplib2 when a connection fails or drops
+TRANSIENT_ERRORS = (socket.error, httplib.HTTPException, httplib2.ServerNotFoundError)
+
+
+class RetryBudget(object):
+    """
+    Caps retries at a fraction of overall traffic: every request deposits
+    "ratio" of a retry and every retry withdraws a whole one, with at most
+    "reserve" retries banked.  This keeps an outage from turning into a
+    flood of retries.
+    """
+    def __init__(self, ratio=0.2, reserve=10):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.balance = float(reserve)
+        self.lock = threading.Lock()
+
+    def deposit(self):
+        with self.lock:
+            self.balance = min(self.balance + self.ratio, self.reserve)
+
+    def withdraw(self):
+        with self.lock:
+            if self.balance < 1:
+                return False
+            self.balance -= 1
+            return True
+
+
+class RetryPolicy(object):
+    """
+    Decides whether a failed request is sent again and how long to wait first.
+
+    Requests failing with one of "retry_statuses" or a transient socket error
+    are retried up to "max_attempts" attempts in all, waiting a random delay
+    between 0 and base_delay * 2 ** attempt (capped at "max_delay") between
+    attempts.  Only methods in "idempotent_methods" are retried after the
+    request may have reached LinkedIn, so a POST (send_message, share, ...)
+    is only sent again when the connection was refused outright.  Retries
+    also draw on a RetryBudget.  "timeout" is the socket timeout applied to
+    each attempt.
+    """
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=10, timeout=30,
+                 retry_statuses=(500, 502, 503, 504), idempotent_methods=('GET', 'HEAD', 'PUT', 'DELETE'),
+                 budget=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.retry_statuses = retry_statuses
+        self.idempotent_methods = idempotent_methods
+        self.budget = budget or RetryBudget()
+
+    def record_request(self):
+        self.budget.deposit()
+
+    def retries_response(self, method, resp, attempt):
+        if resp.status not in self.retry_statuses or method not in self.idempotent_methods:
+            return False
+        return self.can_retry(attempt)
+
+    def retries_error(self, method, error, attempt):
+        if not isinstance(error, TRANSIENT_ERRORS):
+            return False
+        refused = isinstance(error, socket.error) and error.args and error.args[0] == errno.ECONNREFUSED
+        if method not in self.idempotent_methods and not refused:
+            return False
+        return self.can_retry(attempt)
+
+    def can_retry(self, attempt):
+        return attempt + 1 < self.max_attempts and self.budget.withdraw()
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
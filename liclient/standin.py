@@ -0,0 +1,397 @@
+#! usr/bin/env python
+
+import BaseHTTPServer
+import SocketServer
+import json
+import random
+import re
+import threading
+import time
+import urlparse
+import zlib
+
+import oauth2 as oauth
+
+ERROR_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n' + \
+    '<error><status>%d</status><timestamp>%d</timestamp><request-id>STANDIN</request-id>' + \
+    '<error-code>0</error-code><message>%s</message></error>'
+
+UPDATE_TYPES = ['STAT', 'CONN', 'JGRP', 'QSTN', 'ANSW', 'NCON', 'CCEM', 'JOBP']
+
+
+class StandInServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    A local stand-in for the LinkedIn REST API, for benchmarks and tests.
+
+    Serves synthetic profiles, connections, network updates, comment feeds,
+    people searches and mailbox/share/status writes, as XML or as JSON
+    (format=json or an x-li-format header).  Every request must carry a
+    valid HMAC-SHA1 OAuth signature for one of the "consumers" and "tokens"
+    (dicts of key to secret), checked with oauth2.Server.
+
+    "latency" (plus up to "jitter") seconds are added to each response;
+    "error_rate" and "throttle_rate" are the fractions of requests answered
+    with a 503 error or a 403 throttle error.  Searches with different
+    keywords find "search_results" people each, overlapping but not the same
+    ones.  Point a client at it with:
+
+        server = StandInServer(consumers={'key': 'secret'},
+                               tokens={'token': 'token-secret'}).start()
+        api = LinkedInAPI('key', 'secret', api_url=server.url)
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 0), consumers=None, tokens=None, latency=0, jitter=0,
+                 error_rate=0, throttle_rate=0, connections=500, search_results=1000,
+                 update_interval=3600 * 1000, comments=5, seed=None):
+        BaseHTTPServer.HTTPServer.__init__(self, address, StandInHandler)
+        self.consumers = consumers or {}
+        self.tokens = tokens or {}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.connections = connections
+        self.search_results = search_results
+        self.update_interval = update_interval
+        self.comments = comments
+        self.random = random.Random(seed)
+        self.oauth_server = oauth.Server()
+        self.oauth_server.add_signature_method(oauth.SignatureMethod_HMAC_SHA1())
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def url(self):
+        return 'http://%s:%d' % self.server_address
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def count_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def roll(self, rate):
+        with self.lock:
+            return rate and self.random.random() < rate
+
+
+class StandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # responses are written in several pieces; without this, each keep-alive
+    # response waits out the client's delayed ACK (~40ms)
+    disable_nagle_algorithm = True
+
+    def __init__(self, *args):
+        self.routing = [
+            ('GET', r'^/v1/people-search', self.people_search),
+            ('GET', r'^/v1/people/~/connections', self.connections),
+            ('GET', r'^/v1/people/~/network/updates/key=([^/]+)/update-comments', self.comment_feed),
+            ('POST', r'^/v1/people/~/network/updates/key=([^/]+)/update-comments', self.created),
+            ('GET', r'^/v1/people/~/network', self.network_updates),
+            ('POST', r'^/v1/people/~/mailbox', self.created),
+            ('POST', r'^/v1/people/~/shares', self.share),
+            ('PUT', r'^/v1/people/~/current-status', self.no_content),
+            ('GET', r'^/v1/people::\(([^)]*)\)', self.profiles),
+            ('GET', r'^/v1/people/(~|id=[^:/?]+)', self.profile),
+        ]
+        BaseHTTPServer.BaseHTTPRequestHandler.__init__(self, *args)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.dispatch()
+
+    def do_POST(self):
+        self.dispatch()
+
+    def do_PUT(self):
+        self.dispatch()
+
+    def dispatch(self):
+        server = self.server
+        server.count_request()
+        length = int(self.headers.get('Content-Length') or 0)
+        self.body = self.rfile.read(length) if length else ''
+        path, _, query = self.path.partition('?')
+        self.query = dict((k, v if len(v) > 1 else v[0]) for k, v in urlparse.parse_qs(query).items())
+        self.json = self.query.get('format') == 'json' or self.headers.get('x-li-format') == 'json'
+
+        delay = server.latency + (server.jitter and server.random.uniform(0, server.jitter))
+        if delay:
+            time.sleep(delay)
+        if not self.verify(path, query):
+            return self.error(401, '[unauthorized]. Invalid OAuth signature')
+        if server.roll(server.error_rate):
+            return self.error(503, 'Service unavailable')
+        if server.roll(server.throttle_rate):
+            return self.error(403, 'Throttle limit for calls to this resource is reached.')
+        for method, pattern, handler in self.routing:
+            match = re.match(pattern, path)
+            if match and method == self.command:
+                return handler(path, *match.groups())
+        return self.error(404, 'Could not find requested resource')
+
+    def verify(self, path, query):
+        headers = {}
+        if self.headers.get('Authorization'):
+            headers['Authorization'] = self.headers['Authorization']
+        if self.command == 'POST' and 'x-www-form-urlencoded' in (self.headers.get('Content-Type') or ''):
+            query = '&'.join(filter(None, [query, self.body]))
+        url = 'http://%s%s' % (self.headers.get('Host'), path)
+        try:
+            request = oauth.Request.from_request(self.command, url, headers, query_string=query)
+            consumer_key = request.get_parameter('oauth_consumer_key')
+            consumer = oauth.Consumer(consumer_key, self.server.consumers[consumer_key])
+            token = None
+            if 'oauth_token' in request:
+                token = oauth.Token(request['oauth_token'], self.server.tokens[request['oauth_token']])
+            self.server.oauth_server.verify_request(request, consumer, token)
+        except (oauth.Error, KeyError):
+            return False
+        return True
+
+    def respond(self, status, content, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def respond_data(self, xml, data):
+        if self.json:
+            self.respond(200, json.dumps(data), 'application/json')
+        else:
+            self.respond(200, xml, 'text/xml')
+
+    def error(self, status, message):
+        if self.json:
+            content = json.dumps({'status': status, 'timestamp': int(time.time() * 1000),
+                                  'errorCode': 0, 'message': message})
+            self.respond(status, content, 'application/json')
+        else:
+            self.respond(status, ERROR_XML % (status, int(time.time() * 1000), message), 'text/xml')
+
+    def created(self, path, *args):
+        self.respond(201, '', 'text/xml')
+
+    def no_content(self, path, *args):
+        self.respond(204, '', 'text/xml')
+
+    def share(self, path):
+        self.respond(201, json.dumps({'updateKey': 'UNIU-1-SHARE', 'updateUrl': 'http://www.linkedin.com/updates'}),
+                     'application/json')
+
+    def page(self, total, default_count=10):
+        start = int(self.query.get('start', 0))
+        count = int(self.query.get('count', default_count))
+        return start, range(start, min(start + count, total))
+
+    def profile(self, path, member):
+        member = 'self' if member == '~' else member[3:]
+        self.respond_data(person_xml(member), person_json(member))
+
+    def profiles(self, path, ids):
+        ids = [i[3:] for i in ids.split(',') if i.startswith('id=')]
+        xml = '<people total="%d">%s</people>' % (len(ids), ''.join(person_xml(i) for i in ids))
+        self.respond_data(xml, {'_total': len(ids), 'values': [person_json(i) for i in ids]})
+
+    def connections(self, path):
+        total = self.server.connections
+        start, rng = self.page(total, 500)
+        ids = ['conn%d' % i for i in rng]
+        xml = '<connections total="%d" start="%d" count="%d">%s</connections>' % \
+            (total, start, len(ids), ''.join(person_xml(i) for i in ids))
+        self.respond_data(xml, {'_total': total, '_start': start, '_count': len(ids),
+                                'values': [person_json(i) for i in ids]})
+
+    def people_search(self, path):
+        total = self.server.search_results
+        start, rng = self.page(total)
+        shift = zlib.crc32(self.query.get('keywords', '')) % 100
+        ids = ['srch%d' % (i + shift) for i in rng]
+        xml = '<people-search><people total="%d" start="%d" count="%d">%s</people><num-results>%d</num-results>' \
+            '</people-search>' % (total, start, len(ids), ''.join(person_xml(i) for i in ids), total)
+        self.respond_data(xml, {'people': {'_total': total, '_start': start, '_count': len(ids),
+                                           'values': [person_json(i) for i in ids]},
+                                'numResults': total})
+
+    def network_updates(self, path):
+        interval = self.server.update_interval
+        before = int(self.query.get('before') or time.time() * 1000)
+        after = int(self.query.get('after') or before - 7 * 24 * 3600 * 1000)
+        types = self.query.get('type') or UPDATE_TYPES
+        if not isinstance(types, list):
+            types = [types]
+        # one update every "interval" milliseconds, most recent first
+        stamps = [t for t in xrange(before - before % interval, after, -interval)
+                  if t < before and update_type(t, interval) in types]
+        total = len(stamps)
+        start, rng = self.page(total)
+        stamps = [stamps[i] for i in rng]
+        xml = '<network><updates total="%d" start="%d" count="%d">%s</updates></network>' % \
+            (total, start, len(stamps), ''.join(update_xml(t, update_type(t, interval)) for t in stamps))
+        self.respond_data(xml, {'_total': total, '_start': start, '_count': len(stamps),
+                                'values': [update_json(t, update_type(t, interval)) for t in stamps]})
+
+    def comment_feed(self, path, key):
+        n = self.server.comments
+        xml = '<update-comments total="%d">%s</update-comments>' % (n, ''.join(comment_xml(key, i) for i in range(n)))
+        self.respond_data(xml, {'_total': n, 'values': [comment_json(key, i) for i in range(n)]})
+
+
+def update_type(stamp, interval):
+    return UPDATE_TYPES[(stamp // interval) % len(UPDATE_TYPES)]
+
+
+def person_xml(member):
+    return ('<person><id>%(id)s</id><first-name>First%(id)s</first-name><last-name>Last%(id)s</last-name>'
+            '<headline>Engineer at Company %(id)s</headline>'
+            '<location><name>San Francisco Bay Area</name><country><code>us</code></country></location>'
+            '<site-standard-profile-request><url>http://www.linkedin.com/profile?viewProfile=&amp;key=%(id)s</url>'
+            '</site-standard-profile-request>'
+            '<positions total="2">'
+            '<position><id>%(id)s1</id><title>Engineer</title><summary>Builds things</summary>'
+            '<start-date><year>2008</year><month>6</month></start-date><is-current>true</is-current>'
+            '<company><id>1</id><name>Company %(id)s</name></company></position>'
+            '<position><id>%(id)s2</id><title>Intern</title><summary>Learned things</summary>'
+            '<start-date><year>2007</year><month>6</month></start-date>'
+            '<end-date><year>2008</year><month>5</month></end-date><is-current>false</is-current>'
+            '<company><id>2</id><name>Other Company</name></company></position>'
+            '</positions>'
+            '<educations total="1"><education><id>%(id)s3</id><school-name>State University</school-name>'
+            '<field-of-study>Computer Science</field-of-study><start-date><year>2003</year></start-date>'
+            '<end-date><year>2007</year></end-date><degree>BS</degree></education></educations>'
+            '<skills total="2"><skill><id>1</id><skill><name>Python</name></skill></skill>'
+            '<skill><id>2</id><skill><name>XML</name></skill></skill></skills>'
+            '</person>') % {'id': member}
+
+
+def person_json(member):
+    return {
+        'id': member,
+        'firstName': 'First%s' % member,
+        'lastName': 'Last%s' % member,
+        'headline': 'Engineer at Company %s' % member,
+        'location': {'name': 'San Francisco Bay Area', 'country': {'code': 'us'}},
+        'siteStandardProfileRequest': {'url': 'http://www.linkedin.com/profile?viewProfile=&key=%s' % member},
+        'positions': {'_total': 2, 'values': [
+            {'id': member + '1', 'title': 'Engineer', 'summary': 'Builds things',
+             'startDate': {'year': 2008, 'month': 6}, 'isCurrent': True,
+             'company': {'id': 1, 'name': 'Company %s' % member}},
+            {'id': member + '2', 'title': 'Intern', 'summary': 'Learned things',
+             'startDate': {'year': 2007, 'month': 6}, 'endDate': {'year': 2008, 'month': 5}, 'isCurrent': False,
+             'company': {'id': 2, 'name': 'Other Company'}}]},
+        'educations': {'_total': 1, 'values': [
+            {'id': member + '3', 'schoolName': 'State University', 'fieldOfStudy': 'Computer Science',
+             'startDate': {'year': 2003}, 'endDate': {'year': 2007}, 'degree': 'BS'}]},
+        'skills': {'_total': 2, 'values': [
+            {'id': 1, 'skill': {'name': 'Python'}}, {'id': 2, 'skill': {'name': 'XML'}}]},
+    }
+
+
+def short_person_xml(member):
+    return ('<person><id>%(id)s</id><first-name>First%(id)s</first-name><last-name>Last%(id)s</last-name>'
+            '<site-standard-profile-request><url>http://www.linkedin.com/profile?key=%(id)s</url>'
+            '</site-standard-profile-request></person>') % {'id': member}
+
+
+def short_person_json(member):
+    return {'id': member, 'firstName': 'First%s' % member, 'lastName': 'Last%s' % member,
+            'siteStandardProfileRequest': {'url': 'http://www.linkedin.com/profile?key=%s' % member}}
+
+
+def update_xml(stamp, u_type):
+    member = 'net%d' % (stamp % 97)
+    content = {
+        'STAT': lambda: short_person_xml(member)[:-9] +
+            '<current-status>Status update %d</current-status></person>' % stamp,
+        'CONN': lambda: short_person_xml(member)[:-9] +
+            '<connections total="1">%s</connections></person>' % short_person_xml('new%d' % stamp),
+        'JGRP': lambda: short_person_xml(member)[:-9] +
+            '<member-groups total="1"><member-group><id>1</id><name>Python Developers</name>'
+            '<site-group-request><url>http://www.linkedin.com/groups?gid=1</url></site-group-request>'
+            '</member-group></member-groups></person>',
+        'QSTN': lambda: '<question><id>%d</id><title>Question %d?</title>'
+            '<author><id>%s</id><first-name>First%s</first-name><last-name>Last%s</last-name></author>'
+            '<web-url>http://www.linkedin.com/answers/%d</web-url></question>' % (stamp, stamp, member, member, member, stamp),
+        'ANSW': lambda: '<question><id>%d</id><title>Question %d?</title>'
+            '<web-url>http://www.linkedin.com/answers/%d</web-url>'
+            '<author><id>a</id><first-name>Asker</first-name><last-name>Person</last-name></author>'
+            '<answers total="1"><answer><id>1</id><web-url>http://www.linkedin.com/answers/%d/1</web-url>'
+            '<author><id>%s</id><first-name>First%s</first-name><last-name>Last%s</last-name></author>'
+            '</answer></answers></question>' % (stamp, stamp, stamp, stamp, member, member, member),
+        'NCON': lambda: short_person_xml(member),
+        'CCEM': lambda: short_person_xml(member),
+        'JOBP': lambda: '<job><id>%d</id><position><title>Engineer %d</title></position>'
+            '<company><name>Company %s</name></company>'
+            '<job-poster><id>%s</id><first-name>First%s</first-name><last-name>Last%s</last-name></job-poster>'
+            '<site-job-request><url>http://www.linkedin.com/jobs?jobId=%d</url></site-job-request></job>' %
+            (stamp, stamp, member, member, member, member, stamp),
+    }[u_type]()
+    comments = ''
+    if u_type == 'STAT':
+        comments = '<update-comments total="1">%s</update-comments>' % comment_xml('%s-%d' % (u_type, stamp), 0)
+    return ('<update><timestamp>%d</timestamp><update-key>%s-%d</update-key><update-type>%s</update-type>'
+            '<update-content>%s</update-content><is-commentable>true</is-commentable>%s</update>') % \
+        (stamp, u_type, stamp, u_type, content, comments)
+
+
+def update_json(stamp, u_type):
+    member = 'net%d' % (stamp % 97)
+    person = short_person_json(member)
+    if u_type == 'STAT':
+        content = {'person': dict(person, currentStatus='Status update %d' % stamp)}
+    elif u_type == 'CONN':
+        content = {'person': dict(person, connections={'_total': 1, 'values': [short_person_json('new%d' % stamp)]})}
+    elif u_type == 'JGRP':
+        content = {'person': dict(person, memberGroups={'_total': 1, 'values': [
+            {'id': 1, 'name': 'Python Developers',
+             'siteGroupRequest': {'url': 'http://www.linkedin.com/groups?gid=1'}}]})}
+    elif u_type == 'QSTN':
+        content = {'question': {'id': stamp, 'title': 'Question %d?' % stamp,
+                                'author': {'id': member, 'firstName': person['firstName'],
+                                           'lastName': person['lastName']},
+                                'webUrl': 'http://www.linkedin.com/answers/%d' % stamp}}
+    elif u_type in ('NCON', 'CCEM'):
+        content = {'person': person}
+    elif u_type == 'JOBP':
+        content = {'job': {'id': stamp, 'position': {'title': 'Engineer %d' % stamp},
+                           'company': {'name': 'Company %s' % member},
+                           'jobPoster': {'id': member, 'firstName': person['firstName'],
+                                         'lastName': person['lastName']},
+                           'siteJobRequest': {'url': 'http://www.linkedin.com/jobs?jobId=%d' % stamp}}}
+    else:
+        content = {'question': {'id': stamp, 'title': 'Question %d?' % stamp,
+                                'webUrl': 'http://www.linkedin.com/answers/%d' % stamp,
+                                'author': {'id': 'a', 'firstName': 'Asker', 'lastName': 'Person'},
+                                'answers': {'_total': 1, 'values': [
+                                    {'id': 1, 'webUrl': 'http://www.linkedin.com/answers/%d/1' % stamp,
+                                     'author': {'id': member, 'firstName': person['firstName'],
+                                                'lastName': person['lastName']}}]}}}
+    update = {'timestamp': stamp, 'updateKey': '%s-%d' % (u_type, stamp), 'updateType': u_type,
+              'updateContent': content, 'isCommentable': True}
+    if u_type == 'STAT':
+        update['updateComments'] = {'_total': 1, 'values': [comment_json('%s-%d' % (u_type, stamp), 0)]}
+    return update
+
+
+def comment_xml(key, i):
+    return ('<update-comment><id>%d</id><sequence-number>%d</sequence-number><comment>Comment %d on %s</comment>'
+            '%s<timestamp>1300000000000</timestamp></update-comment>') % (i, i, i, key, short_person_xml('c%d' % i))
+
+
+def comment_json(key, i):
+    return {'id': i, 'sequenceNumber': i, 'comment': 'Comment %d on %s' % (i, key),
+            'person': short_person_json('c%d' % i), 'timestamp': 1300000000000}
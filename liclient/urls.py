@@ -0,0 +1,130 @@
+#! usr/bin/env python
+
+import re
+import threading
+import urllib
+from collections import OrderedDict
+
+
+class URLTemplate(object):
+    """
+    The URL of an API resource, compiled once: the endpoint URL, where "~"
+    stands for the current member and "{NAME}" for a value given when the
+    URL is expanded (e.g. a network update key), followed by its field
+    selectors.  expand() fills in the member IDs, the slots and the query
+    string.
+    """
+    def __init__(self, url, selectors=None):
+        self.selectors = ':(%s)' % ','.join(selectors) if selectors else ''
+        self.url = url + self.selectors
+        # a member selection replaces the "/~" between head and tail
+        self.head, self.member, tail = url.partition('/~')
+        self.tail = tail + self.selectors
+        self.slots = SLOT.findall(url)
+
+    def expand(self, ids=None, params=None, slots=None):
+        """
+        The URL for the members in "ids" (the current member if empty)
+        with the values in "slots" and the query parameters in "params";
+        see encode_query().
+        """
+        if not ids:
+            url = self.url
+        else:
+            assert isinstance(ids, (tuple, list)), 'Keyword argument "id" must be a list'
+            assert self.member, 'No member to select in %s' % self.url
+            if len(ids) == 1:
+                url = self.head + '/id=' + ids[0] + self.tail
+            else:
+                url = self.head + '::(' + ','.join(['id=' + i for i in ids]) + ')' + self.tail
+        for name in self.slots:
+            assert slots and name in slots, 'No value for {%s} in %s' % (name, self.url)
+            url = url.replace('{' + name + '}', urllib.quote(slots[name], safe=''))
+        query = encode_query(params) if params else ''
+        return url + '?' + query if query else url
+
+
+class URLTemplates(object):
+    """
+    URLTemplates keyed by endpoint URL and field selectors, compiled the
+    first time they are asked for.  At most "max_size" are held; the least
+    recently used one is dropped to make room for a new one, so callers
+    passing ever-changing selectors can't grow the cache without bound or
+    push the endpoints in constant use out of it.
+    """
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.templates = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, url, selectors=None):
+        key = (url, tuple(selectors) if selectors else ())
+        with self.lock:
+            template = self.templates.pop(key, None)
+            if template is None:
+                template = URLTemplate(url, selectors)
+                if len(self.templates) >= self.max_size:
+                    self.templates.popitem(last=False)
+            self.templates[key] = template
+        return template
+
+    def __len__(self):
+        return len(self.templates)
+
+
+def encode_query(params):
+    """
+    Encode query parameters, sorted by name so equal queries give equal
+    URLs.  Lists and tuples give one parameter per item (type=STAT&type=CONN);
+    None and empty values are left out, but 0 and False are sent.  Booleans
+    are sent as "true" and "false", unicode as UTF-8.
+    """
+    pairs = []
+    for key in sorted(params):
+        value = params[key]
+        prefix = QUERY_KEYS.get(key)
+        if prefix is None:
+            prefix = QUERY_KEYS[key] = urllib.quote_plus(key) + '='
+        kind = type(value)
+        if kind is list or kind is tuple:
+            for item in value:
+                text = query_value(item)
+                if text:
+                    pairs.append(prefix + text)
+        else:
+            text = query_value(value)
+            if text:
+                pairs.append(prefix + text)
+    return '&'.join(pairs)
+
+
+def query_value(value):
+    """
+    The encoded text of a query value, or None if it is to be left out.
+    """
+    kind = type(value)
+    if kind is int or kind is long:
+        return str(value)
+    if value is None:
+        return None
+    if kind is bool:
+        return 'true' if value else 'false'
+    if kind is unicode:
+        value = value.encode('utf-8')
+    elif kind is not str:
+        value = str(value)
+    if value.translate(None, UNRESERVED):
+        return urllib.quote_plus(value)
+    return value
+
+
+# a value filled in by URLTemplate.expand(): {NETWORK UPDATE KEY}
+SLOT = re.compile(r'\{([^{}]+)\}')
+
+# characters sent as they are
+UNRESERVED = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_.-'
+
+# parameter name -> its encoded "name=", shared by every query
+QUERY_KEYS = {}
+
+URL_TEMPLATES = URLTemplates()